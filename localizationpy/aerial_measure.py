@@ -1,20 +1,46 @@
 import os
+import threading
+from collections.abc import Mapping
 
+import numpy as np
+
+import localizationpy.fieldvalue as fv
 import localizationpy.file_manager as fm
 
 
 class AerialMeasure(object):
     """
     Class containing the field values for a specific antenna and the relevant information
-    of the measure itself
+    of the measure itself.
+
+    Field values are stored by columns (ids, Ex, Ey, Ez and optionally Hx, Hy, Hz) in numpy arrays,
+    FieldValue objects are only built when accessing the entries.
     """
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, dtype=np.complex128, h_fields=False, data=None):
+        """
+        :param file_path: string containing the path to the "project_ord_tot_ant_X.cer" file
+        :param dtype: numpy complex dtype used to store the field values
+        :param h_fields: bool, if True magnetic field values are also stored
+        :param data: [optional] tuple[float freq, numpy array of ids, numpy array of values] already parsed from
+                     the file (see file_manager._parse_file_aerial_measure). If None, the file is parsed.
+        """
         self.name = os.path.basename(file_path).split('.')[0]
-        self.id = self.name.split('_')[-1]
-        self.freq, entries = fm._parse_file_aerial_measure(file_path)
-        self.entries = dict()
-        for entry in entries:
-            self.entries.update({entry.id: entry})
+        self.id = get_aerial_id(file_path)
+        if data is None:
+            data = fm._parse_file_aerial_measure(file_path, h_fields=h_fields)
+        self.freq, ids, values = data
+        self.ids = ids
+        self.ex = _to_complex(values[:, 0], values[:, 1], dtype)
+        self.ey = _to_complex(values[:, 2], values[:, 3], dtype)
+        self.ez = _to_complex(values[:, 4], values[:, 5], dtype)
+        if h_fields:
+            self.hx = _to_complex(values[:, 6], values[:, 7], dtype)
+            self.hy = _to_complex(values[:, 8], values[:, 9], dtype)
+            self.hz = _to_complex(values[:, 10], values[:, 11], dtype)
+        else:
+            self.hx = self.hy = self.hz = None
+        self.__build_row_index()
+        self.entries = FieldValueMap(self)
 
     def __repr__(self):
         return (f'Aerial {self.id}\r\n'
@@ -23,3 +49,143 @@ class AerialMeasure(object):
                 f'\tFreq: {self.freq!r}\r\n'
                 f'\tNum of measures: {len(self.entries)!r}\r\n')
 
+    def __build_row_index(self):
+        # FASANT files list ids as a contiguous sequence, so the row of an id can be calculated directly.
+        # Otherwise rows are found with a binary search over the sorted ids
+        self.__first_id = None
+        self.__sorter = None
+        self.__row_index = None
+        if len(self.ids) > 0 and np.array_equal(self.ids, np.arange(self.ids[0], self.ids[0] + len(self.ids))):
+            self.__first_id = int(self.ids[0])
+        else:
+            self.__sorter = np.argsort(self.ids, kind='stable')
+
+    def get_rows(self, ids) -> np.ndarray:
+        """
+        Gets the rows of the columns matching the given ids
+
+        :param ids: int or array-like of ints with the ids of the field values
+        :return: numpy array of ints with the rows
+        :raises KeyError: if any of the ids has no field value
+        """
+        ids = np.asarray(ids)
+        if ids.dtype.kind not in 'iu':
+            if ids.size == 0:
+                return np.empty(ids.shape, dtype=np.intp)
+            raise KeyError(ids.tolist())
+        if self.__first_id is not None:
+            rows = ids - self.__first_id
+            found = (rows >= 0) & (rows < len(self.ids))
+        else:
+            pos = np.searchsorted(self.ids, ids, sorter=self.__sorter)
+            pos = np.minimum(pos, len(self.ids) - 1)
+            rows = self.__sorter[pos] if len(self.ids) > 0 else pos
+            found = (self.ids[rows] == ids) if len(self.ids) > 0 else np.zeros(ids.shape, dtype=bool)
+        if not np.all(found):
+            raise KeyError(ids[~found].tolist())
+        return rows.astype(np.intp)
+
+    def get_row(self, id: int) -> int:
+        """
+        Gets the row of the columns matching a single id, see get_rows
+
+        :param id: int with the id of the field value
+        :return: int with the row
+        :raises KeyError: if the id has no field value
+        """
+        if self.__first_id is not None:
+            row = id - self.__first_id
+            if 0 <= row < len(self.ids):
+                return row
+            raise KeyError(id)
+        if self.__row_index is None:
+            self.__row_index = {pid: row for row, pid in enumerate(self.ids.tolist())}
+        return self.__row_index[id]
+
+    def get_field_value(self, row: int) -> fv.FieldValue:
+        """
+        Builds the FieldValue object of a row
+
+        :param row: int with the row of the columns
+        :return: FieldValue object
+        """
+        return fv.FieldValue(id=int(self.ids[row]), ex=complex(self.ex[row]), ey=complex(self.ey[row]),
+                             ez=complex(self.ez[row]))
+
+
+class FieldValueMap(Mapping):
+    """
+    Read-only mapping of ids to FieldValue objects of an AerialMeasure. FieldValue objects are built on demand.
+    """
+    def __init__(self, aerial_measure: AerialMeasure):
+        self.__aerial_measure = aerial_measure
+
+    def __getitem__(self, id):
+        if isinstance(id, (bool, np.bool_)) or not isinstance(id, (int, np.integer)):
+            raise KeyError(id)
+        row = self.__aerial_measure.get_row(int(id))
+        return self.__aerial_measure.get_field_value(row)
+
+    def __iter__(self):
+        return (int(id) for id in self.__aerial_measure.ids)
+
+    def __len__(self):
+        return len(self.__aerial_measure.ids)
+
+
+class AerialMeasureMap(Mapping):
+    """
+    Read-only mapping of aerial ids to AerialMeasure objects, which are loaded the first time they are accessed
+    and kept afterwards.
+    """
+    def __init__(self, loaders: dict):
+        """
+        :param loaders: dict of aerial id and function without arguments returning the AerialMeasure object
+        """
+        self.__loaders = loaders
+        self.__measures = dict()
+        self.__lock = threading.Lock()
+
+    def __getitem__(self, aerial):
+        measure = self.__measures.get(aerial)
+        if measure is None:
+            loader = self.__loaders[aerial]
+            with self.__lock:
+                measure = self.__measures.get(aerial)
+                if measure is None:
+                    measure = loader()
+                    self.__measures[aerial] = measure
+        return measure
+
+    def __iter__(self):
+        return iter(self.__loaders)
+
+    def __len__(self):
+        return len(self.__loaders)
+
+    def is_loaded(self, aerial: str) -> bool:
+        """
+        Checks if an aerial has already been loaded
+
+        :param aerial: string with the aerial id
+        :return: True if the AerialMeasure object is already built, False otherwise
+        """
+        return aerial in self.__measures
+
+
+def get_aerial_id(file_path: str) -> str:
+    """
+    Gets the id of the aerial of a "project_ord_tot_ant_X.cer" file given its path, without parsing it
+
+    :param file_path: string containing the path to the file
+    :return: string with the aerial id. Example: "1", "7" or "all"
+    """
+    return os.path.basename(file_path).split('.')[0].split('_')[-1]
+
+
+def _to_complex(real, imag, dtype) -> np.ndarray:
+    """Builds a contiguous complex array given its real and imaginary parts"""
+    res = np.empty(len(real), dtype=dtype)
+    res.real = real
+    res.imag = imag
+    return res
@@ -0,0 +1,393 @@
+import math
+
+import numpy as np
+
+INFINITE_POWER = -200  # Power value used by FieldValue.power as "infinite" (no signal)
+
+
+def round_decimals(values, decimals: int) -> np.ndarray:
+    """
+    Rounds an array of values to a number of decimals, matching the results of "'%.nf' % value" formatting.
+
+    np.round works on the scaled binary value, so values lying (almost) in the middle of two decimals may be rounded
+    the other way than the string formatting used by the scalar functions. Those few values are rounded again
+    with the built-in round, which is correctly rounded as the string formatting, so both implementations give the
+    very same results.
+
+    :param values: array-like of float values to round
+    :param decimals: int number of decimals to keep
+    :return: numpy array of floats with the rounded values
+    """
+    values = np.asarray(values, dtype=float)
+    res = np.round(values, decimals)
+    for idx in get_round_suspects(values, decimals):
+        res.flat[idx] = round(float(values.flat[idx]), decimals)
+    return res
+
+
+def get_centers(coords: np.ndarray, selections) -> np.ndarray:
+    """
+    Array version of mapping.Shape3D.center: calculates the centers of several selections of points at once.
+    Coordinates are added one point after another (np.cumsum adds sequentially), in the order of the selections,
+    and rounded as Shape3D does, so both implementations give the very same results.
+
+    Selections of different lengths are grouped by length, so the cost is proportional to the total number of
+    selected points.
+
+    :param coords: numpy array (points, 3) with the coordinates of the points
+    :param selections: numpy array of ints (selections, k) or list of arrays of ints with the positions of the points
+                       of every selection
+    :return: numpy array (selections, 3) with the centers, NaN for empty selections
+    """
+    if isinstance(selections, np.ndarray) and selections.ndim == 2:
+        groups = [(np.arange(selections.shape[0]), selections)]
+    else:
+        selections = [np.asarray(sel, dtype=np.intp) for sel in selections]
+        lengths = np.array([len(sel) for sel in selections], dtype=np.intp)
+        order = np.argsort(lengths, kind='stable')
+        bounds = np.flatnonzero(np.diff(lengths[order])) + 1
+        groups = [(rows, np.stack([selections[row] for row in rows.tolist()]))
+                  for rows in np.split(order, bounds) if len(rows) > 0]
+    centers = np.full((len(selections), 3), np.nan)
+    for rows, indexes in groups:
+        if indexes.shape[1] == 0:
+            continue
+        sums = np.cumsum(coords[indexes], axis=1)[:, -1]
+        centers[rows] = sums / indexes.shape[1]
+    return round_decimals(centers, 2)
+
+
+def get_point_distances(a: np.ndarray, b: np.ndarray, decimals=2) -> np.ndarray:
+    """
+    Array version of metrics.get_euclidean_distance: calculates the euclidean distance between every point of a and
+    the point of b in the same position.
+    Rounded distances lying (almost) in the middle of two decimals are calculated again as the scalar function does,
+    so both implementations give the very same results.
+
+    :param a: numpy array (points, 3) with the coordinates of the points
+    :param b: numpy array (points, 3) with the coordinates of the points
+    :param decimals: [optional] int number of decimals to round the distances to. If None, they are not rounded
+    :return: numpy array of floats (points)
+    """
+    diff = b - a
+    distances = np.sqrt((diff ** 2).sum(axis=1))
+    if decimals is None:
+        return distances
+    res = np.round(distances, decimals)
+    for idx in get_round_suspects(distances, decimals):
+        res[idx] = get_exact_distance(a[idx], b[idx], decimals)
+    return res
+
+
+def get_pairwise_distances(a: np.ndarray, b: np.ndarray, decimals=2) -> np.ndarray:
+    """
+    Calculates the euclidean distance between every point of a and every point of b, giving the same results as
+    metrics.get_euclidean_distance for every pair when rounded (see get_point_distances).
+
+    :param a: numpy array (points a, 3) with the coordinates of the points
+    :param b: numpy array (points b, 3) with the coordinates of the points
+    :param decimals: [optional] int number of decimals to round the distances to. If None, they are not rounded
+    :return: numpy array (points a, points b) with the distances
+    """
+    sq_sums = np.zeros((a.shape[0], b.shape[0]), dtype=float)
+    for col in range(a.shape[1]):
+        sq_sums += (b[np.newaxis, :, col] - a[:, col, np.newaxis]) ** 2
+    distances = np.sqrt(sq_sums)
+    if decimals is None:
+        return distances
+    res = np.round(distances, decimals)
+    for idx in get_round_suspects(distances, decimals):
+        row, col = divmod(int(idx), distances.shape[1])
+        res[row, col] = get_exact_distance(a[row], b[col], decimals)
+    return res
+
+
+def get_exact_distance(a, b, decimals=2) -> float:
+    """
+    Calculates the euclidean distance between two points as metrics.get_euclidean_distance does, with an exact sum
+    of the squared differences and correctly rounded
+
+    :param a: array-like (3) with the coordinates of a point
+    :param b: array-like (3) with the coordinates of another point
+    :param decimals: int number of decimals to round the distance to
+    :return: float with the distance
+    """
+    return round(math.sqrt(math.fsum([math.pow(vb - va, 2) for va, vb in zip(a.tolist(), b.tolist())])), decimals)
+
+
+def get_round_suspects(values: np.ndarray, decimals: int) -> np.ndarray:
+    """
+    Gets the values lying (almost) in the middle of two decimals, which np.round may round the other way than the
+    scalar functions do (see round_decimals)
+
+    :param values: numpy array of floats
+    :param decimals: int number of decimals values are rounded to
+    :return: numpy array of ints with the flat positions of the values
+    """
+    scaled = values * 10.0 ** decimals
+    return np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+
+
+def get_power_matrix(simulation, aerials: list, dbm) -> np.ndarray:
+    """
+    Builds the matrix of powers of a simulation, one row per point (following simulation.points order)
+    and one column per aerial.
+
+    :param simulation: Simulation object to get the powers from
+    :param aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
+    :param dbm: bool specifying power units (True for using dBm)
+    :return: numpy array of floats with shape (number of points, number of aerials)
+    """
+    powers = np.empty((len(simulation.points), len(aerials)), dtype=float)
+    for col, aerial in enumerate(aerials):
+        powers[:, col] = simulation.get_powers(aerial, dbm)
+    return powers
+
+
+def get_power_distances(mpowers: np.ndarray, fpowers: np.ndarray) -> np.ndarray:
+    """
+    Calculates the power euclidean distances between every mobile and every fingerprint.
+
+    Base formula (Pa1mi-Pa1fj)^2+(Pa2mi-Pa2fj)^2+(Pa3mi-Pa3fj)^2, where aerials measuring an "infinite" power
+    for the mobile are not taken into account. Results are rounded to two decimals.
+
+    :param mpowers: numpy array (mobiles, aerials) with the powers of the mobiles
+    :param fpowers: numpy array (fingerprints, aerials) with the powers of the fingerprints
+    :return: numpy array (mobiles, fingerprints) with the power distances
+    """
+    return sum_power_distances((get_aerial_power_distances(mpowers[:, col], fpowers[:, col])
+                                for col in range(mpowers.shape[1])), (mpowers.shape[0], fpowers.shape[0]))
+
+
+def get_aerial_power_distances(mpower: np.ndarray, fpower: np.ndarray) -> np.ndarray:
+    """
+    Calculates the squared power differences between every mobile and every fingerprint for a single aerial,
+    that is, one of the terms of get_power_distances (not rounded). Mobiles measuring an "infinite" power get 0.
+
+    :param mpower: numpy array (mobiles) with the powers of the mobiles
+    :param fpower: numpy array (fingerprints) with the powers of the fingerprints
+    :return: numpy array (mobiles, fingerprints) with the squared differences
+    """
+    sq_diff = (mpower[:, np.newaxis] - fpower[np.newaxis, :]) ** 2
+    return np.where((mpower == INFINITE_POWER)[:, np.newaxis], 0.0, sq_diff)
+
+
+def sum_power_distances(aerial_distances, shape) -> np.ndarray:
+    """
+    Adds up the squared differences of several aerials (see get_aerial_power_distances) into the power distances,
+    rounded to two decimals. Terms are added in the given order, so the results match get_power_distances.
+
+    :param aerial_distances: iterable of numpy arrays (mobiles, fingerprints), one per aerial
+    :param shape: tuple (mobiles, fingerprints) with the shape of the distances
+    :return: numpy array (mobiles, fingerprints) with the power distances
+    """
+    distances = np.zeros(shape, dtype=float)
+    for sq_diff in aerial_distances:
+        distances += sq_diff
+    return round_decimals(distances, 2)
+
+
+def get_nearest_indexes(distances: np.ndarray, n: int) -> np.ndarray:
+    """
+    Gets the indexes of the n smallest distances of every row, sorted by distance. Ties are solved by index,
+    as a stable sort of the whole row would do.
+
+    :param distances: numpy array (mobiles, fingerprints) with the distances
+    :param n: int number of indexes to get per row
+    :return: numpy array of ints with shape (mobiles, min(n, fingerprints))
+    """
+    rows, cols = distances.shape
+    n = max(0, min(n, cols))
+    if n == 0 or rows == 0:
+        return np.empty((rows, n), dtype=np.intp)
+    if n < cols:
+        kth = np.partition(distances, n - 1, axis=1)[:, n - 1][:, np.newaxis]
+        selected = distances < kth
+        missing = n - selected.sum(axis=1)
+        ties = distances == kth
+        selected |= ties & (np.cumsum(ties, axis=1) <= missing[:, np.newaxis])
+        indexes = np.nonzero(selected)[1].reshape(rows, n)
+    else:
+        indexes = np.broadcast_to(np.arange(cols), (rows, cols))
+    order = np.argsort(np.take_along_axis(distances, indexes, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(indexes, order, axis=1)
+
+
+def check_threshold(a, b, threshold):
+    """
+    Array version of metrics.check_threshold: checks if a is in b +- threshold, element by element
+
+    :param a: numpy array of floats to check if in threshold
+    :param b: numpy array of floats used to apply the threshold (broadcastable to a)
+    :param threshold: float number to stablish the frame to check
+    :return: numpy array of bools
+    """
+    return (a >= (b - threshold)) & (a <= (b + threshold))
+
+
+def get_threshold_mask(mpowers: np.ndarray, fpowers: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Calculates which fingerprints fall into the threshold of every mobile for all the aerials.
+
+    For every aerial, a fingerprint is a candidate if its power is in the mobile power +- threshold.
+    Aerials without any candidate (or measuring an "infinite" power for the mobile) are not taken into account,
+    the rest of candidates are intersected.
+
+    :param mpowers: numpy array (mobiles, aerials) with the powers of the mobiles
+    :param fpowers: numpy array (fingerprints, aerials) with the powers of the fingerprints
+    :param threshold: float number in which power values will be checked
+    :return: numpy array of bools (mobiles, fingerprints), True for the fingerprints used in the estimation
+    """
+    # Kept as public API, estimations use the packed form (see get_threshold_bits)
+    return unpack_candidates(get_threshold_bits(mpowers, fpowers, threshold), fpowers.shape[0])
+
+
+def get_threshold_bits(mpowers: np.ndarray, fpowers: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Bitset version of get_threshold_mask: candidates of every aerial are packed (see pack_candidates) and
+    intersected word by word.
+
+    :param mpowers: numpy array (mobiles, aerials) with the powers of the mobiles
+    :param fpowers: numpy array (fingerprints, aerials) with the powers of the fingerprints
+    :param threshold: float number in which power values will be checked
+    :return: numpy array of uint64 (mobiles, words) with the bitsets of the fingerprints used in the estimation
+    """
+    return intersect_candidate_bits((pack_candidates(get_aerial_candidates(mpowers[:, col], fpowers[:, col],
+                                                                           threshold))
+                                     for col in range(mpowers.shape[1])), (mpowers.shape[0], fpowers.shape[0]))
+
+
+def get_aerial_candidates(mpower: np.ndarray, fpower: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Calculates which fingerprints fall into the threshold of every mobile for a single aerial. Mobiles measuring an
+    "infinite" power get no candidates.
+
+    :param mpower: numpy array (mobiles) with the powers of the mobiles
+    :param fpower: numpy array (fingerprints) with the powers of the fingerprints
+    :param threshold: float number in which power values will be checked
+    :return: numpy array of bools (mobiles, fingerprints)
+    """
+    candidates = check_threshold(fpower[np.newaxis, :], mpower[:, np.newaxis], threshold)
+    candidates &= (mpower != INFINITE_POWER)[:, np.newaxis]
+    return candidates
+
+
+def get_threshold_levels(mpower: np.ndarray, fpower: np.ndarray, thresholds) -> np.ndarray:
+    """
+    Calculates, for a single aerial and a list of sorted thresholds, the position of the smallest threshold making
+    every fingerprint a candidate of every mobile (see get_aerial_candidates). Candidates only grow with the threshold,
+    so the candidates for thresholds[t] are the ones with a level lower or equal than t.
+
+    Levels are first found through the absolute power differences and then checked against the very same comparison
+    used by check_threshold, which may disagree because of rounding for differences close to a threshold.
+
+    :param mpower: numpy array (mobiles) with the powers of the mobiles
+    :param fpower: numpy array (fingerprints) with the powers of the fingerprints
+    :param thresholds: array-like of float thresholds, sorted in ascending order
+    :return: numpy array of ints (mobiles, fingerprints), len(thresholds) for pairs which are never candidates
+    """
+    thresholds = np.asarray(thresholds, dtype=float)
+    size = len(thresholds)
+    levels = np.searchsorted(thresholds, np.abs(fpower[np.newaxis, :] - mpower[:, np.newaxis]), side='left')
+
+    def in_threshold(lvl):
+        threshold = thresholds[np.clip(lvl, 0, max(size - 1, 0))] if size > 0 else np.inf
+        return (lvl >= 0) & (lvl < size) & check_threshold(fpower[np.newaxis, :], mpower[:, np.newaxis], threshold)
+
+    while True:
+        raise_level = (levels < size) & ~in_threshold(levels)
+        if not raise_level.any():
+            break
+        levels[raise_level] += 1
+    while True:
+        lower_level = (levels > 0) & in_threshold(levels - 1)
+        if not lower_level.any():
+            break
+        levels[lower_level] -= 1
+
+    levels[mpower == INFINITE_POWER, :] = size
+    return levels
+
+
+def intersect_candidate_bits(aerial_bits, shape) -> np.ndarray:
+    """
+    Intersects the packed candidates of several aerials (see get_aerial_candidates and pack_candidates), ignoring
+    the aerials without any candidate for a mobile.
+
+    :param aerial_bits: iterable of numpy arrays of uint64 (mobiles, words), one per aerial
+    :param shape: tuple (mobiles, fingerprints) with the shape of the candidates
+    :return: numpy array of uint64 (mobiles, words) with the bitsets of the fingerprints used in the estimation
+    """
+    bits = np.full((shape[0], get_bitset_words(shape[1])), np.iinfo(np.uint64).max, dtype=np.uint64)
+    any_candidate = np.zeros(shape[0], dtype=bool)
+    for candidates in aerial_bits:
+        has_candidates = candidates.any(axis=1)
+        bits[has_candidates] &= candidates[has_candidates]
+        any_candidate |= has_candidates
+    # Padding bits are only cleared by the aerials with candidates
+    bits[~any_candidate] = 0
+    return bits
+
+
+def get_bitset_words(size: int) -> int:
+    """
+    Gets the number of 64 bits words needed to hold a bitset
+
+    :param size: int number of bits
+    :return: int number of words
+    """
+    return (size + 63) // 64
+
+
+def pack_candidates(candidates: np.ndarray) -> np.ndarray:
+    """
+    Packs a boolean candidates matrix into bitsets, one per row: bit j of a row (word j // 64, bit j % 64) is set
+    if column j is True. Bitsets are 8 times smaller than boolean matrices and are intersected word by word.
+
+    :param candidates: numpy array of bools (mobiles, fingerprints)
+    :return: numpy array of uint64 (mobiles, words)
+    """
+    rows, cols = candidates.shape
+    words = get_bitset_words(cols)
+    packed = np.zeros((rows, words * 8), dtype=np.uint8)
+    packed[:, :(cols + 7) // 8] = np.packbits(candidates, axis=1, bitorder='little')
+    return packed.view('<u8').astype(np.uint64, copy=False)
+
+
+def unpack_candidates(bits: np.ndarray, size: int) -> np.ndarray:
+    """
+    Unpacks bitsets into a boolean candidates matrix, see pack_candidates
+
+    :param bits: numpy array of uint64 (mobiles, words)
+    :param size: int number of fingerprints (columns)
+    :return: numpy array of bools (mobiles, fingerprints)
+    """
+    packed = np.ascontiguousarray(bits, dtype='<u8').view(np.uint8)
+    return np.unpackbits(packed, axis=1, count=size, bitorder='little').astype(bool)
+
+
+def count_candidates(bits: np.ndarray) -> np.ndarray:
+    """
+    Counts the candidates (population count) of every bitset, see pack_candidates
+
+    :param bits: numpy array of uint64 (mobiles, words)
+    :return: numpy array of ints (mobiles)
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bits).sum(axis=1, dtype=np.int64)
+    packed = np.ascontiguousarray(bits, dtype='<u8').view(np.uint8)
+    return np.unpackbits(packed, axis=1).sum(axis=1, dtype=np.int64)
+
+
+def get_candidate_indexes(bits: np.ndarray, size: int) -> list:
+    """
+    Gets the positions of the candidates of every bitset, see pack_candidates
+
+    :param bits: numpy array of uint64 (mobiles, words)
+    :param size: int number of fingerprints
+    :return: list of numpy arrays of ints, one per mobile, with the sorted positions of its candidates
+    """
+    if bits.shape[0] == 0:
+        return list()
+    _, cols = np.nonzero(unpack_candidates(bits, size))
+    return np.split(cols, np.cumsum(count_candidates(bits))[:-1])
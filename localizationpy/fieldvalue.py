@@ -1,5 +1,8 @@
 import math
 
+import numpy as np
+
+import localizationpy.engine as eng
 import localizationpy.metrics as mt
 
 
@@ -49,3 +52,44 @@ class FieldValue(object):
                 res = math.log10(power)
 
         return float('%.3f' % res)
+
+
+def get_power_array(ex: np.ndarray, ey: np.ndarray, ez: np.ndarray, dbm=True) -> np.ndarray:
+    """
+    Vectorized version of FieldValue.power, calculating the power of many field values at once.
+
+    :param ex: numpy array of complex with the Ex components
+    :param ey: numpy array of complex with the Ey components
+    :param ez: numpy array of complex with the Ez components
+    :param dbm: bool specifying power units (True for using dBm)
+    :return: numpy array of floats with three decimal precision, giving the same values as FieldValue.power
+    """
+    ex, ey, ez = (np.asarray(e, dtype=np.complex128) for e in (ex, ey, ez))
+    with np.errstate(divide='ignore'):
+        if dbm:
+            ez_module = __get_module_array(ez)
+            res = 20 * np.log10(ez_module)
+            res += -10 * math.log10(8 * 120)
+            res += 0  # aerial gain
+            res += 0  # radiated power
+            res += 20 * math.log10(3e8 / (2.4e9 * math.pi))
+            res += 10 * math.log10(3 / 50)
+            res += 30
+            res[ez_module == 0] = -200  # Considering -200 as "infinite"
+        else:
+            power = __get_module_array(ex) ** 2
+            power += __get_module_array(ey) ** 2
+            power += __get_module_array(ez) ** 2
+            res = np.where(power != 0, np.log10(power), 0.0)
+
+    powers = np.round(res, 3)
+    # Values lying in the middle of two decimals are calculated one by one, so they are rounded exactly as
+    # FieldValue.power does
+    for idx in eng.get_round_suspects(res, 3):
+        powers[idx] = FieldValue(None, complex(ex[idx]), complex(ey[idx]), complex(ez[idx])).power(dbm)
+    return powers
+
+
+def __get_module_array(z: np.ndarray) -> np.ndarray:
+    """Vectorized version of metrics.get_complex_module"""
+    return np.sqrt(z.real ** 2 + z.imag ** 2)
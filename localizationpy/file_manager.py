@@ -1,61 +1,182 @@
+import hashlib
+import json
+import math
 import os
+import tempfile
+import warnings
+from contextlib import ExitStack
+
+import numpy as np
 
-import localizationpy.fieldvalue as fv
 import localizationpy.mapping as mp
 import localizationpy.metrics as mt
 
 import pickle
 
+SIMULATION_CACHE_FILE = '.localizationpy_cache.npz'
+__ESTIMATION_FILE_HEADER = "Original point,Estimated point,Number of Estimation Fingerprints,Estimation Fingerprints," \
+                           "Error\n"
+__POWER_FILE_HEADER = "Mobile,Fingerprint,Aerial,Mobile Power,Fingerprint Power\n"
+__SIMULATION_CACHE_VERSION = 1
+
 
-def _parse_file_puntos(file_path: str) -> list:
+def _parse_file_puntos(file_path: str) -> mp.PointArray:
     """
     Parses "puntos.dat" file given its absolute path
 
     :param file_path: string containing the absolute path to the file
-    :return: list of Point objects
+    :return: PointArray object with the points, whose ids are their line numbers (starting at 1)
     """
-    point_list = []
-
-    file = open(file_path, 'r')
-    lines = file.readlines()
-    file.close()
-    num = int(lines.pop(0))
-
-    for idx, line in enumerate(lines):
-        coord_values = str.split(line)
-        point = mp.Point(float(coord_values[0]), float(coord_values[1]), float(coord_values[2]), id=(idx + 1))
-        point_list.append(point)
+    with open(file_path, 'r') as file:
+        num = int(file.readline())
+        # Coordinates are parsed at once, Point objects are only built when accessed
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)  # Empty files
+            coords = np.loadtxt(file, dtype=float, usecols=(0, 1, 2), ndmin=2).reshape(-1, 3)
 
-    assert(len(point_list) == num)
+    assert(len(coords) == num)
 
-    return point_list
+    return mp.PointArray(coords, ids=np.arange(1, len(coords) + 1))
 
 
-def _parse_file_aerial_measure(file_path: str) -> (float, list):
+def _parse_file_aerial_measure(file_path: str, h_fields=False) -> (float, np.ndarray, np.ndarray):
     """
     Parses "project_ord_tot_ant_X.cer" file given its absolute path
 
     :param file_path: string containing the absolute path to the file
-    :return: tuple[float frequency value, list of FieldValue]
+    :param h_fields: bool, if True magnetic field columns (Hx, Hy, Hz) are also returned
+    :return: tuple[float frequency value, numpy array of int ids, numpy array of floats with a row per id holding
+             the real and imaginary parts of Ex, Ey, Ez (and Hx, Hy, Hz if h_fields)]
     """
-    field_value_list = []
+    columns = 13 if h_fields else 7
+
+    with open(file_path, 'r') as file:
+        freq = float(file.readline().split()[2])
+        headers = file.readline().split()
+        # Numeric block is parsed at once, unused columns are skipped by the parser itself
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)  # Empty files
+            block = np.loadtxt(file, dtype=float, usecols=range(columns), ndmin=2)
+
+    if block.shape[0] == 0:
+        block = np.empty((0, columns), dtype=float)
+
+    return freq, block[:, 0].astype(np.int64), block[:, 1:]
 
-    file = open(file_path, 'r')
-    lines = file.readlines()
-    file.close()
-    freq = float(lines.pop(0).split()[2])
 
-    headers = lines.pop(0).split()
+def __get_file_signature(file_path: str, content_hash=False) -> dict:
+    """
+    Gets the values identifying the current state of a file
 
-    for line in lines:
-        line = line.split()
-        field_value = fv.FieldValue(id=int(line[0]),
-                                    ex=complex(float(line[1]), float(line[2])),
-                                    ey=complex(float(line[3]), float(line[4])),
-                                    ez=complex(float(line[5]), float(line[6])))
-        field_value_list.append(field_value)
+    :param file_path: string containing the absolute path to the file
+    :param content_hash: bool, if True the sha1 hash of the file content is also calculated
+    :return: dict holding the name, size, modification time and (optionally) content hash of the file
+    """
+    stat = os.stat(file_path)
+    signature = {'name': os.path.basename(file_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if content_hash:
+        sha1 = hashlib.sha1()
+        with open(file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                sha1.update(chunk)
+        signature['sha1'] = sha1.hexdigest()
+    return signature
+
+
+def _load_simulation_cache(simulation_path: str, file_paths: list, h_fields=False):
+    """
+    Loads the parsed data of a simulation folder from its binary cache file, if it is still valid.
 
-    return freq, field_value_list
+    The cache is valid if it holds the same files, with the same size and either the same modification time or
+    the same content hash.
+
+    :param simulation_path: string containing the path of the simulation folder
+    :param file_paths: list of strings with the paths of the simulation files ("puntos.dat" and ".cer" files)
+    :param h_fields: bool, if True the cache must also hold the magnetic field columns
+    :return: dict with 'points' (PointArray object, None if there is no points file) and 'aerials'
+             (dict of file name and tuple[float freq, numpy array of ids, numpy array of values]),
+             None if there is no valid cache
+    """
+    cache_path = os.path.join(simulation_path, SIMULATION_CACHE_FILE)
+    if not os.path.exists(cache_path):
+        return None
+
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            manifest = json.loads(str(cache['manifest']))
+            if manifest['version'] != __SIMULATION_CACHE_VERSION or (h_fields and not manifest['h_fields']):
+                return None
+            cached_files = {entry['name']: entry for entry in manifest['files']}
+            if sorted(cached_files) != sorted(os.path.basename(path) for path in file_paths):
+                return None
+            touched = False
+            for path in file_paths:
+                entry = cached_files[os.path.basename(path)]
+                signature = __get_file_signature(path)
+                if signature['size'] != entry['size']:
+                    return None
+                if signature['mtime_ns'] != entry['mtime_ns']:
+                    if __get_file_signature(path, content_hash=True)['sha1'] != entry['sha1']:
+                        return None
+                    touched = True
+
+            points = None
+            if 'points' in cache:
+                coords = cache['points']
+                points = mp.PointArray(coords, ids=np.arange(1, len(coords) + 1))
+            aerials = dict()
+            for idx, name in enumerate(manifest['aerials']):
+                values = cache['aerial_{}_values'.format(idx)]
+                if not h_fields:
+                    values = values[:, :6]
+                aerials.update({name: (manifest['freqs'][idx], cache['aerial_{}_ids'.format(idx)], values)})
+    except (OSError, ValueError, KeyError):
+        warnings.warn("Unreadable cache file {}, simulation will be parsed".format(cache_path))
+        return None
+
+    if touched:
+        # Files were rewritten with the same content, so the cache is saved again with their current state
+        _save_simulation_cache(simulation_path, file_paths, points, aerials, manifest['h_fields'])
+
+    return {'points': points, 'aerials': aerials}
+
+
+def _save_simulation_cache(simulation_path: str, file_paths: list, points, aerials: dict, h_fields=False):
+    """
+    Saves the parsed data of a simulation folder into a binary cache file within the folder.
+    A warning is raised if the folder is not writable.
+
+    :param simulation_path: string containing the path of the simulation folder
+    :param file_paths: list of strings with the paths of the simulation files ("puntos.dat" and ".cer" files)
+    :param points: PointArray object parsed from "puntos.dat" file, None if there is no points file
+    :param aerials: dict of file name and tuple[float freq, numpy array of ids, numpy array of values]
+    :param h_fields: bool specifying if aerial values include the magnetic field columns
+    """
+    manifest = {
+        'version': __SIMULATION_CACHE_VERSION,
+        'h_fields': h_fields,
+        'files': [__get_file_signature(path, content_hash=True) for path in file_paths],
+        'aerials': list(aerials.keys()),
+        'freqs': [freq for freq, ids, values in aerials.values()],
+    }
+    arrays = {'manifest': np.array(json.dumps(manifest))}
+    if points is not None:
+        arrays['points'] = mp.get_coordinates(points)
+    for idx, (freq, ids, values) in enumerate(aerials.values()):
+        arrays['aerial_{}_ids'.format(idx)] = ids
+        arrays['aerial_{}_values'.format(idx)] = values
+
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=simulation_path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                np.savez(tmp_file, **arrays)
+            os.replace(tmp_path, os.path.join(simulation_path, SIMULATION_CACHE_FILE))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    except OSError as e:
+        warnings.warn("Cache file could not be saved for simulation {}: {}".format(simulation_path, e))
 
 
 def create_points_file(file_path: str, points: list):
@@ -74,6 +195,46 @@ def create_points_file(file_path: str, points: list):
             f.write(str(p.x) + " " + str(p.y) + " " + str(p.z) + '\n')
 
 
+def create_simulation_files(folder_path: str, simulation):
+    """
+    Creates a simulation folder holding only the points of a given simulation or cohort (for example, a reduced
+    fingerprint set, see fprint_index.reduce_fingerprints), so it can be loaded later as a Simulation.
+    Points file and aerial files keep the names and format of the original simulation files, points (and the ids of
+    their field values) are numbered again from 1.
+
+    :param folder_path: string with the path of the new simulation folder
+    :param simulation: Simulation or SimulationCohort object
+    :return:
+    """
+    if not os.path.exists(folder_path):
+        os.makedirs(folder_path)
+
+    points = simulation.points
+    points_file = 'puntos.dat'
+    aerial_files = list()
+    for file in sorted(os.listdir(simulation.simulation_path)):
+        if file.endswith('.cer'):
+            aerial_files.append(file)
+        elif file.endswith('.dat'):
+            points_file = file
+
+    create_points_file(os.path.join(folder_path, points_file), points)
+
+    for file in aerial_files:
+        with open(os.path.join(simulation.simulation_path, file), 'r') as source:
+            headers = [source.readline(), source.readline()]
+            rows = dict()
+            for line in source:
+                values = line.split(maxsplit=1)
+                if len(values) == 2:
+                    rows[int(values[0])] = values[1]
+        with open(os.path.join(folder_path, file), 'w') as f:
+            f.writelines(headers)
+            for idx, point in enumerate(points):
+                if point.id in rows:
+                    f.write('{:6d}     {}'.format(idx + 1, rows[point.id]))
+
+
 def create_power_estimation_file(file_path: str, estimations: list, check_threshold=False):
     """
     Creates a csv file to hold the power values (fingerprints and mobiles) of an estimation
@@ -86,21 +247,10 @@ def create_power_estimation_file(file_path: str, estimations: list, check_thresh
     if not os.path.exists(os.path.dirname(file_path)):
         os.makedirs(os.path.dirname(file_path))
 
-    header = "Mobile,Fingerprint,Aerial,Mobile Power,Fingerprint Power\n"
     with open(file_path, 'w') as f:
-        f.write(header)
+        f.write(__POWER_FILE_HEADER)
         for estimation in estimations:
-            for einput in estimation.inputs:
-                for measure in einput.power_measures:
-                    if check_threshold and not measure.in_threshold:
-                        continue
-                    row = str(einput.mpoint.id)
-                    row += ',' + str(einput.fpoint.id)
-                    row += ',' + str(measure.aerial)
-                    row += ',' + str(measure.mpower)
-                    row += ',' + str(measure.fpower)
-                    row += '\n'
-                    f.write(row)
+            __write_power_rows(f, estimation, check_threshold)
 
 
 def create_fprints_in_radius_power_file(file_path: str, estimations: list, radius: float):
@@ -115,21 +265,10 @@ def create_fprints_in_radius_power_file(file_path: str, estimations: list, radiu
     if not os.path.exists(os.path.dirname(file_path)):
         os.makedirs(os.path.dirname(file_path))
 
-    header = "Mobile,Fingerprint,Aerial,Mobile Power,Fingerprint Power\n"
     with open(file_path, 'w') as f:
-        f.write(header)
+        f.write(__POWER_FILE_HEADER)
         for estimation in estimations:
-            for einput in estimation.inputs:
-                if mt.get_euclidean_distance(einput.fpoint, einput.mpoint) > radius:
-                    continue
-                for measure in einput.power_measures:
-                    row = str(einput.mpoint)
-                    row += ',' + str(einput.fpoint)
-                    row += ',' + str(measure.aerial)
-                    row += ',' + str(measure.mpower)
-                    row += ',' + str(measure.fpower)
-                    row += '\n'
-                    f.write(row)
+            __write_fprints_in_radius_power_rows(f, estimation, radius)
 
 
 def create_estimation_file(file_path: str, estimations: list):
@@ -143,13 +282,113 @@ def create_estimation_file(file_path: str, estimations: list):
     if not os.path.exists(os.path.dirname(file_path)):
         os.makedirs(os.path.dirname(file_path))
     with open(file_path, 'w') as f:
-        f.write("Original point,Estimated point,Number of Estimation Fingerprints,Estimation Fingerprints,Error\n")
+        f.write(__ESTIMATION_FILE_HEADER)
         for entry in estimations:
-            f.write(str(entry.mpoint) + ',' +
-                    str(entry.epoint) + ',' +
-                    str(len(entry.fpoints)) + ',' +
-                    str(" | ".join(str(p) for p in entry.fpoints)) + ',' +
-                    str(entry.error) + '\n')
+            __write_estimation_row(f, entry)
+
+
+def create_estimation_stream_files(estimations, estimation_path=None, power_path=None, check_threshold=False,
+                                   radius_power_path=None, radius=None) -> dict:
+    """
+    Creates the csv files of an estimation consuming its Estimation objects one by one, so they can be written while
+    they are being calculated (see metrics.iter_estimation) without keeping them in memory.
+    Files share the format of create_estimation_file, create_power_estimation_file and
+    create_fprints_in_radius_power_file. Error statistics are also calculated on the fly.
+
+    :param estimations: iterable (list or generator) of Estimation objects
+    :param estimation_path: [optional] string with the path of the estimation file, including file name
+    :param power_path: [optional] string with the path of the power values file, including file name
+    :param check_threshold: bool, if True, power values included will be checked to be inside the threshold
+    :param radius_power_path: [optional] string with the path of the power values of the fingerprints within radius
+                              file, including file name
+    :param radius: float value holding the radius to be applied to get those "close" fingerprints
+    :return: dict holding the number of estimations ("count"), the number of estimated points ("estimated") and
+             the "mae" and "stdev" of the errors (-1 if they can not be calculated)
+    """
+    assert radius_power_path is None or radius is not None, "Radius must be specified for the radius power file"
+
+    with ExitStack() as stack:
+        files = dict()
+        for key, path, header in (('estimation', estimation_path, __ESTIMATION_FILE_HEADER),
+                                  ('power', power_path, __POWER_FILE_HEADER),
+                                  ('radius_power', radius_power_path, __POWER_FILE_HEADER)):
+            if path is None:
+                continue
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            files[key] = stack.enter_context(open(path, 'w'))
+            files[key].write(header)
+
+        count = 0
+        estimated = 0
+        mean = 0.0
+        sq_sum = 0.0
+        for estimation in estimations:
+            count += 1
+            if 'estimation' in files:
+                __write_estimation_row(files['estimation'], estimation)
+            if 'power' in files:
+                __write_power_rows(files['power'], estimation, check_threshold)
+            if 'radius_power' in files:
+                __write_fprints_in_radius_power_rows(files['radius_power'], estimation, radius)
+            if estimation.estimated:
+                # Welford's online algorithm
+                estimated += 1
+                delta = estimation.error - mean
+                mean += delta / estimated
+                sq_sum += delta * (estimation.error - mean)
+
+    return {
+        "count": count,
+        "estimated": estimated,
+        "mae": mean if estimated > 0 else -1,
+        "stdev": math.sqrt(sq_sum / (estimated - 1)) if estimated > 1 else -1,
+    }
+
+
+def __write_estimation_row(f, entry):
+    """Writes the row of an Estimation object into an estimation file"""
+    f.write(str(entry.mpoint) + ',' +
+            str(entry.epoint) + ',' +
+            str(len(entry.fpoints)) + ',' +
+            str(" | ".join(str(p) for p in entry.fpoints)) + ',' +
+            str(entry.error) + '\n')
+
+
+def __write_power_rows(f, estimation, check_threshold):
+    """Writes the rows of an Estimation object into a power values file"""
+    for einput in estimation.inputs:
+        for measure in einput.power_measures:
+            if check_threshold and not measure.in_threshold:
+                continue
+            row = str(einput.mpoint.id)
+            row += ',' + str(einput.fpoint.id)
+            row += ',' + str(measure.aerial)
+            row += ',' + str(measure.mpower)
+            row += ',' + str(measure.fpower)
+            row += '\n'
+            f.write(row)
+
+
+def __write_fprints_in_radius_power_rows(f, estimation, radius):
+    """Writes the rows of an Estimation object into a power values of the fingerprints within radius file"""
+    inputs = estimation.inputs
+    if isinstance(inputs, mt.EstimationInputs):
+        # Inputs hold every fingerprint, only those close to the mobile are built
+        positions = inputs.fprint_powers.get_point_index().query_radius(inputs.mpoint, radius).tolist()
+    else:
+        positions = [pos for pos, einput in enumerate(inputs)
+                     if mt.get_euclidean_distance(einput.fpoint, einput.mpoint) <= radius]
+    for pos in positions:
+        einput = inputs[pos]
+        for measure in einput.power_measures:
+            row = str(einput.mpoint)
+            row += ',' + str(einput.fpoint)
+            row += ',' + str(measure.aerial)
+            row += ',' + str(measure.mpower)
+            row += ',' + str(measure.fpower)
+            row += '\n'
+            f.write(row)
 
 
 def create_result_file(file_path: str, estimation_results: dict):
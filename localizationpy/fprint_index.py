@@ -0,0 +1,477 @@
+import heapq
+import math
+
+import numpy as np
+
+import localizationpy.engine as eng
+import localizationpy.mapping as mp
+
+# Rounding of the power distances to two decimals may move a distance up to 0.005, so fingerprints whose exact
+# distance is this close to the k-th one may still be among the k nearest after rounding
+ROUNDING_MARGIN = 0.011
+
+
+class KDTree(object):
+    """
+    Class implementing a k-d tree over a set of points, answering k-nearest and radius queries with squared
+    euclidean distances. Leaves hold up to leaf_size points, which are compared at once.
+    """
+    def __init__(self, data, leaf_size=32):
+        """
+        :param data: array-like (points, dimensions) with the coordinates of the points
+        :param leaf_size: int maximum number of points of a leaf
+        """
+        assert leaf_size > 0, "Leaf size must be a positive number"
+        data = np.ascontiguousarray(data, dtype=float)
+        self.data = data.reshape(-1, 1) if data.ndim == 1 else data
+        self.leaf_size = leaf_size
+        self.indexes = np.arange(len(self.data))
+        self.__starts = list()
+        self.__ends = list()
+        self.__children = list()
+        self.__mins = list()
+        self.__maxs = list()
+        if len(self.data) > 0:
+            self.__build()
+
+    def __len__(self):
+        return len(self.data)
+
+    def __build(self):
+        self.__add_node(0, len(self.data))
+        pending = [0]
+        while pending:
+            node = pending.pop()
+            start, end = self.__starts[node], self.__ends[node]
+            if end - start <= self.leaf_size:
+                continue
+            spread = self.__maxs[node] - self.__mins[node]
+            dim = int(np.argmax(spread))
+            if spread[dim] == 0:
+                # All the points are the same, no split is possible
+                continue
+            middle = (start + end) // 2
+            rows = self.indexes[start:end]
+            order = np.argpartition(self.data[rows, dim], middle - start)
+            self.indexes[start:end] = rows[order]
+            left = self.__add_node(start, middle)
+            right = self.__add_node(middle, end)
+            self.__children[node] = (left, right)
+            pending.extend((left, right))
+        self.__mins = np.array(self.__mins)
+        self.__maxs = np.array(self.__maxs)
+
+    def __add_node(self, start, end):
+        values = self.data[self.indexes[start:end]]
+        self.__starts.append(start)
+        self.__ends.append(end)
+        self.__children.append(None)
+        self.__mins.append(values.min(axis=0))
+        self.__maxs.append(values.max(axis=0))
+        return len(self.__starts) - 1
+
+    def __get_bound(self, node, point) -> float:
+        """Squared distance from a point to the bounding box of a node"""
+        gap = np.maximum(self.__mins[node] - point, 0) + np.maximum(point - self.__maxs[node], 0)
+        return float(np.dot(gap, gap))
+
+    def __get_leaf_distances(self, node, point):
+        rows = self.indexes[self.__starts[node]:self.__ends[node]]
+        diff = self.data[rows] - point
+        return rows, np.einsum('ij,ij->i', diff, diff)
+
+    def query(self, point, k: int):
+        """
+        Gets the k nearest points to a given one
+
+        :param point: array-like (dimensions) with the coordinates of the point
+        :param k: int number of points to get
+        :return: tuple (numpy array of squared distances, numpy array of indexes), sorted by distance
+        """
+        point = np.asarray(point, dtype=float)
+        k = min(k, len(self.data))
+        best_dist = np.empty(0)
+        best_rows = np.empty(0, dtype=np.intp)
+        if k <= 0:
+            return best_dist, best_rows
+        heap = [(0.0, 0)]
+        while heap:
+            bound, node = heapq.heappop(heap)
+            if len(best_dist) == k and bound > best_dist[-1]:
+                break
+            children = self.__children[node]
+            if children is None:
+                rows, dist = self.__get_leaf_distances(node, point)
+                best_dist = np.concatenate((best_dist, dist))
+                best_rows = np.concatenate((best_rows, rows))
+                order = np.argsort(best_dist, kind='stable')[:k]
+                best_dist, best_rows = best_dist[order], best_rows[order]
+            else:
+                for child in children:
+                    child_bound = self.__get_bound(child, point)
+                    if len(best_dist) < k or child_bound <= best_dist[-1]:
+                        heapq.heappush(heap, (child_bound, child))
+        return best_dist, best_rows
+
+    def query_radius(self, point, sq_radius: float) -> np.ndarray:
+        """
+        Gets the points within a squared distance of a given one
+
+        :param point: array-like (dimensions) with the coordinates of the point
+        :param sq_radius: float squared radius
+        :return: numpy array of ints with the sorted indexes of the points
+        """
+        point = np.asarray(point, dtype=float)
+        found = list()
+        pending = [0] if len(self.data) > 0 else []
+        while pending:
+            node = pending.pop()
+            if self.__get_bound(node, point) > sq_radius:
+                continue
+            children = self.__children[node]
+            if children is None:
+                rows, dist = self.__get_leaf_distances(node, point)
+                found.append(rows[dist <= sq_radius])
+            else:
+                pending.extend(children)
+        if len(found) == 0:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(found))
+
+
+class FingerprintIndex(object):
+    """
+    Class indexing the fingerprints of a simulation in power space for a given list of aerials, to find the
+    nearest fingerprints of the mobiles (see metrics.get_raytracing_estimation) without comparing every mobile
+    against every fingerprint.
+
+    Aerials measuring an "infinite" power for a mobile are not taken into account, as engine.get_power_distances
+    does, so one KDTree is built (and kept) for every combination of aerials measured by the mobiles. Fingerprints
+    found by the trees are compared again with the exact rounded distances, so results match the numpy engine,
+    including ties.
+    """
+    def __init__(self, fprint_sim, aerials: list, dbm=True, leaf_size=32):
+        """
+        :param fprint_sim: Simulation object containing the info of the fingerprints
+        :param aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
+        :param dbm: bool specifying power units (True for using dBm)
+        :param leaf_size: int maximum number of fingerprints of the leaves of the trees
+        """
+        self.fprint_sim = fprint_sim
+        self.aerials = list(aerials)
+        self.dbm = dbm
+        self.leaf_size = leaf_size
+        self.fpoints = fprint_sim.points
+        self.fpowers = eng.get_power_matrix(fprint_sim, self.aerials, dbm)
+        self.__trees = dict()
+
+    def __repr__(self):
+        return (f'Fingerprint index\r\n'
+                f'------------------------------\r\n'
+                f'\tSimulation: {self.fprint_sim.name!r}\r\n'
+                f'\tAerials: {self.aerials!r}\r\n'
+                f'\tNum of fingerprints: {len(self.fpoints)!r}\r\n')
+
+    def get_tree(self, columns: tuple) -> KDTree:
+        """
+        Gets the tree over the powers of some of the aerials, building it the first time
+
+        :param columns: tuple of ints with the positions of the aerials within aerials
+        :return: KDTree object
+        """
+        tree = self.__trees.get(columns)
+        if tree is None:
+            tree = KDTree(self.fpowers[:, list(columns)], leaf_size=self.leaf_size)
+            self.__trees[columns] = tree
+        return tree
+
+    def query(self, mpowers: np.ndarray, n: int) -> np.ndarray:
+        """
+        Gets the indexes of the n nearest fingerprints of every mobile, sorted by distance.
+        Same results as engine.get_nearest_indexes(engine.get_power_distances(mpowers, fpowers), n).
+
+        :param mpowers: numpy array (mobiles, aerials) with the powers of the mobiles, following aerials order
+        :param n: int number of fingerprints to get per mobile
+        :return: numpy array of ints with shape (mobiles, min(n, fingerprints))
+        """
+        assert mpowers.shape[1] == len(self.aerials), "Mobile powers do not match the aerials of the index"
+        n = max(0, min(n, len(self.fpoints)))
+        nearest = np.empty((mpowers.shape[0], n), dtype=np.intp)
+        if n == 0:
+            return nearest
+        for row, mpower in enumerate(mpowers):
+            columns = tuple(np.flatnonzero(mpower != eng.INFINITE_POWER).tolist())
+            if len(columns) == 0:
+                # Every distance is 0, ties are solved by index
+                nearest[row] = np.arange(n)
+                continue
+            tree = self.get_tree(columns)
+            dist, _ = tree.query(mpower[list(columns)], n)
+            candidates = tree.query_radius(mpower[list(columns)], dist[-1] * (1 + 1e-9) + ROUNDING_MARGIN)
+            distances = eng.get_power_distances(mpower[np.newaxis, :], self.fpowers[candidates])
+            nearest[row] = candidates[eng.get_nearest_indexes(distances, n)[0]]
+        return nearest
+
+
+class PointIndex(object):
+    """
+    Class indexing a set of points (ex: the points of a simulation) by their physical coordinates with a KDTree, to
+    get the points close to a given one without calculating its distance to every point.
+
+    Points found by the tree are compared again with the rounded euclidean distances, so results match
+    metrics.get_euclidean_distance.
+    """
+    def __init__(self, points, leaf_size=32):
+        """
+        :param points: PointArray object, list of Point objects or numpy array (points, 3) with their coordinates
+                       (ex: simulation.point_array)
+        :param leaf_size: int maximum number of points of the leaves of the tree
+        """
+        self.coords = points if isinstance(points, np.ndarray) else mp.get_coordinates(points)
+        self.tree = KDTree(self.coords, leaf_size=leaf_size)
+
+    def __len__(self):
+        return len(self.coords)
+
+    def query_radius(self, point, radius: float, decimals=2) -> np.ndarray:
+        """
+        Gets the points within a distance of a given one, that is, those whose euclidean distance rounded to a
+        number of decimals is not greater than radius
+
+        :param point: Point object or array-like (3) with the coordinates of the point
+        :param radius: float value with the max distance
+        :param decimals: [optional] int number of decimals distances are rounded to. If None, they are not rounded
+        :return: numpy array of ints with the sorted positions of the points
+        """
+        if isinstance(point, mp.Point):
+            point = (point.x, point.y, point.z)
+        point = np.asarray(point, dtype=float)
+        # Distances up to one decimal above radius may still be rounded down to it
+        reach = radius + (10.0 ** -decimals if decimals is not None else 0)
+        if len(self.coords) == 0 or not reach >= 0:
+            return np.empty(0, dtype=np.intp)
+        candidates = self.tree.query_radius(point, reach ** 2 * (1 + 1e-9))
+        candidate_coords = self.coords[candidates]
+        distances = eng.get_point_distances(np.broadcast_to(point, candidate_coords.shape), candidate_coords,
+                                            decimals=decimals)
+        return candidates[distances <= radius]
+
+
+class PartitionIndex(object):
+    """
+    Base class of the indexes splitting the fingerprints of a simulation in groups (lists), each one represented by a
+    power vector (centroid). Every mobile is only compared against the fingerprints of the n_probe groups whose
+    centroids are the nearest to it. It is an approximate search, n_probe trades speed for recall
+    (see metrics.get_index_report).
+
+    Aerials measuring an "infinite" power for a mobile are not taken into account, as engine.get_power_distances
+    does. Candidate fingerprints are ranked with the exact rounded distances, so the results match the numpy engine
+    whenever the true nearest fingerprints are within the probed groups.
+    """
+    def __init__(self, fprint_sim, aerials: list, dbm=True, n_probe=1):
+        """
+        :param fprint_sim: Simulation object containing the info of the fingerprints
+        :param aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
+        :param dbm: bool specifying power units (True for using dBm)
+        :param n_probe: int number of groups compared against every mobile by default
+        """
+        assert n_probe > 0, "Number of probed groups must be a positive number"
+        self.fprint_sim = fprint_sim
+        self.aerials = list(aerials)
+        self.dbm = dbm
+        self.n_probe = n_probe
+        self.fpoints = fprint_sim.points
+        self.fpowers = eng.get_power_matrix(fprint_sim, self.aerials, dbm)
+        self.centroids = np.empty((0, len(self.aerials)))
+        self.lists = list()
+
+    def __repr__(self):
+        return (f'{type(self).__name__}\r\n'
+                f'------------------------------\r\n'
+                f'\tSimulation: {self.fprint_sim.name!r}\r\n'
+                f'\tAerials: {self.aerials!r}\r\n'
+                f'\tNum of fingerprints: {len(self.fpoints)!r}\r\n'
+                f'\tNum of lists: {len(self.lists)!r}\r\n'
+                f'\tNum of probed lists: {self.n_probe!r}\r\n')
+
+    def _set_lists(self, centroids: np.ndarray, labels: np.ndarray):
+        """
+        Sets the groups of the index
+
+        :param centroids: numpy array (groups, aerials) with the powers representing every group
+        :param labels: numpy array of ints with the group of every fingerprint
+        """
+        order = np.argsort(labels, kind='stable')
+        bounds = np.searchsorted(labels[order], np.arange(len(centroids) + 1))
+        self.centroids = centroids
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(centroids))]
+
+    def query(self, mpowers: np.ndarray, n: int, n_probe=None) -> np.ndarray:
+        """
+        Gets the indexes of the (approximate) n nearest fingerprints of every mobile, sorted by distance.
+        If the probed groups hold less than n fingerprints, the next nearest groups are also probed.
+
+        :param mpowers: numpy array (mobiles, aerials) with the powers of the mobiles, following aerials order
+        :param n: int number of fingerprints to get per mobile
+        :param n_probe: [optional] int number of groups to compare against every mobile. If None, index n_probe
+        :return: numpy array of ints with shape (mobiles, min(n, fingerprints))
+        """
+        assert mpowers.shape[1] == len(self.aerials), "Mobile powers do not match the aerials of the index"
+        if n_probe is None:
+            n_probe = self.n_probe
+        n = max(0, min(n, len(self.fpoints)))
+        nearest = np.empty((mpowers.shape[0], n), dtype=np.intp)
+        if n == 0 or mpowers.shape[0] == 0:
+            return nearest
+        probe_order = np.argsort(eng.get_power_distances(mpowers, self.centroids), axis=1, kind='stable')
+        for row, mpower in enumerate(mpowers):
+            probed = n_probe
+            while sum(len(self.lists[i]) for i in probe_order[row, :probed]) < n:
+                probed += 1
+            candidates = np.sort(np.concatenate([self.lists[i] for i in probe_order[row, :probed]]))
+            distances = eng.get_power_distances(mpower[np.newaxis, :], self.fpowers[candidates])
+            nearest[row] = candidates[eng.get_nearest_indexes(distances, n)[0]]
+        return nearest
+
+
+class IVFIndex(PartitionIndex):
+    """
+    Class indexing the fingerprints of a simulation in power space with an inverted file: fingerprints are clustered
+    by their powers (k-means), see PartitionIndex.
+    """
+    def __init__(self, fprint_sim, aerials: list, dbm=True, n_lists=None, n_probe=1, iterations=10, seed=0):
+        """
+        :param fprint_sim: Simulation object containing the info of the fingerprints
+        :param aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
+        :param dbm: bool specifying power units (True for using dBm)
+        :param n_lists: [optional] int number of clusters. If None, the square root of the number of fingerprints
+        :param n_probe: int number of clusters compared against every mobile by default
+        :param iterations: int number of k-means iterations
+        :param seed: int seed of the random generator used to initialize the clusters
+        """
+        super().__init__(fprint_sim, aerials, dbm=dbm, n_probe=n_probe)
+        if n_lists is None:
+            n_lists = int(math.sqrt(len(self.fpoints)))
+        n_lists = max(1, min(n_lists, len(self.fpoints)))
+        self._set_lists(*get_kmeans(self.fpowers, n_lists, iterations=iterations, seed=seed))
+
+
+class GridIndex(PartitionIndex):
+    """
+    Class indexing the fingerprints of a simulation for a coarse-to-fine search: fingerprints are grouped in cells of
+    a coarse grid (for example, every 2m for fingerprints taken every 0.5m), each one represented by the fingerprint
+    nearest to the center of the cell (see mapping.Shape3D). Mobiles are first matched against those coarse
+    fingerprints and then refined among the dense fingerprints of the n_probe best cells, see PartitionIndex.
+    """
+    def __init__(self, fprint_sim, aerials: list, dbm=True, cell_size=2.0, n_probe=4):
+        """
+        :param fprint_sim: Simulation object containing the info of the fingerprints
+        :param aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
+        :param dbm: bool specifying power units (True for using dBm)
+        :param cell_size: float size (meters) of the cells of the coarse grid
+        :param n_probe: int number of cells refined for every mobile by default
+        """
+        assert cell_size > 0, "Cell size must be a positive number"
+        super().__init__(fprint_sim, aerials, dbm=dbm, n_probe=n_probe)
+        self.cell_size = cell_size
+        if len(self.fpoints) == 0:
+            return
+        coords = np.array([(pt.x, pt.y, pt.z) for pt in self.fpoints], dtype=float)
+        cells = np.floor((coords - coords.min(axis=0)) / cell_size).astype(np.int64)
+        _, labels = np.unique(cells, axis=0, return_inverse=True)
+        labels = labels.reshape(-1)
+        self._set_lists(np.empty((labels.max() + 1, len(self.aerials))), labels)
+        self.representatives = np.empty(len(self.lists), dtype=np.intp)
+        for cell, rows in enumerate(self.lists):
+            center = mp.Shape3D(*[self.fpoints[row] for row in rows]).center
+            sq_dist = ((coords[rows] - (center.x, center.y, center.z)) ** 2).sum(axis=1)
+            self.representatives[cell] = rows[np.argmin(sq_dist)]
+        self.centroids = self.fpowers[self.representatives]
+
+
+def get_kmeans(values: np.ndarray, clusters: int, iterations=10, seed=0, chunk_size=10000):
+    """
+    Clusters a set of vectors with the k-means (Lloyd) algorithm
+
+    :param values: numpy array (vectors, dimensions) to cluster
+    :param clusters: int number of clusters
+    :param iterations: int maximum number of iterations
+    :param seed: int seed of the random generator used to pick the initial centroids
+    :param chunk_size: int number of vectors assigned at once, bounding memory use
+    :return: tuple (numpy array (clusters, dimensions) with the centroids, numpy array of ints with the cluster of
+             every vector)
+    """
+    values = np.asarray(values, dtype=float)
+    clusters = max(1, min(clusters, len(values)))
+    rng = np.random.default_rng(seed)
+    centroids = values[np.sort(rng.choice(len(values), clusters, replace=False))].copy()
+    labels = __assign_clusters(values, centroids, chunk_size)
+    for iteration in range(iterations):
+        counts = np.bincount(labels, minlength=clusters)
+        sums = np.stack([np.bincount(labels, weights=values[:, dim], minlength=clusters)
+                         for dim in range(values.shape[1])], axis=1)
+        updated = centroids.copy()
+        filled = counts > 0
+        updated[filled] = sums[filled] / counts[filled][:, np.newaxis]
+        if np.array_equal(updated, centroids):
+            break
+        centroids = updated
+        labels = __assign_clusters(values, centroids, chunk_size)
+
+    return centroids, labels
+
+
+def __assign_clusters(values, centroids, chunk_size):
+    """Gets the nearest centroid of every vector"""
+    labels = np.empty(len(values), dtype=np.intp)
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        # ||x - c||^2 without the ||x||^2 term, which does not change the nearest centroid
+        sq_dist = (centroids ** 2).sum(axis=1)[np.newaxis, :] - 2 * chunk @ centroids.T
+        labels[start:start + chunk_size] = np.argmin(sq_dist, axis=1)
+    return labels
+
+
+def reduce_fingerprints(fprint_sim, aerials: list, n_fprints: int, dbm=True, iterations=10, seed=0, name=None):
+    """
+    Reduces the fingerprints of a simulation, clustering them by their powers (k-means) and keeping, for every
+    cluster, the fingerprint nearest to its centroid. Nearly redundant fingerprints in power space are so dropped.
+    The reduced fingerprints can be measured with metrics.get_reduction_report and stored as a new simulation folder
+    with file_manager.create_simulation_files.
+
+    :param fprint_sim: Simulation object containing the info of the fingerprints
+    :param aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
+    :param n_fprints: int number of fingerprints to keep
+    :param dbm: bool specifying power units (True for using dBm)
+    :param iterations: int number of k-means iterations
+    :param seed: int seed of the random generator used to initialize the clusters
+    :param name: [optional] string, if given the cohort is also kept within the cohorts dict of the simulation
+    :return: SimulationCohort object holding the kept fingerprints, which can be used as fingerprint simulation
+    """
+    assert n_fprints > 0, "Number of fingerprints must be a positive number"
+    fpoints = fprint_sim.points
+    fpowers = eng.get_power_matrix(fprint_sim, aerials, dbm)
+    centroids, labels = get_kmeans(fpowers, n_fprints, iterations=iterations, seed=seed)
+
+    kept = list()
+    for cluster, centroid in enumerate(centroids):
+        rows = np.flatnonzero(labels == cluster)
+        if len(rows) > 0:
+            sq_dist = ((fpowers[rows] - centroid) ** 2).sum(axis=1)
+            kept.append(fpoints[rows[np.argmin(sq_dist)]].id)
+
+    return fprint_sim.cohort(kept, name=name)
+
+
+def get_recall(nearest: np.ndarray, exact_nearest: np.ndarray) -> float:
+    """
+    Calculates the recall of an approximate nearest search: the fraction of the exact nearest fingerprints found
+
+    :param nearest: numpy array of ints (mobiles, n) with the indexes found by the approximate search
+    :param exact_nearest: numpy array of ints (mobiles, n) with the exact indexes
+    :return: float between 0 and 1, 1 if there is nothing to find
+    """
+    if exact_nearest.size == 0:
+        return 1.0
+    found = sum(len(np.intersect1d(a, b)) for a, b in zip(nearest, exact_nearest))
+    return found / exact_nearest.size
@@ -1,5 +1,6 @@
 import operator as op
 import random as rd
+from collections.abc import Sequence
 
 import numpy as np
 
@@ -8,6 +9,8 @@ class Point(object):
     """
     Class containing coordinates information
     """
+    __slots__ = ('id', 'x', 'y', 'z')
+
     def __init__(self, x: float, y: float, z: float, id=None):
         self.id = id
         self.x = x
@@ -26,6 +29,110 @@ class Point(object):
     def __hash__(self):
         return hash((self.id, self.x, self.y, self.z))
 
+    def __getstate__(self):
+        return self.id, self.x, self.y, self.z
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # Points pickled before __slots__ were used
+            state = (state.get('id'), state['x'], state['y'], state['z'])
+        self.id, self.x, self.y, self.z = state
+
+
+class PointArray(Sequence):
+    """
+    Read-only sequence of points backed by a (N, 3) numpy array of coordinates and an array of ids.
+    Point objects are only built when single points are accessed, bulk operations use the arrays directly.
+    """
+    def __init__(self, coords, ids=None):
+        """
+        :param coords: array-like (points, 3) with X, Y and Z coordinates
+        :param ids: [optional] array-like of ints with the ids of the points. If None, points have no id
+        """
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+        self.ids = None if ids is None else np.asarray(ids, dtype=np.int64)
+        assert self.ids is None or len(self.ids) == len(self.coords), "Number of ids does not match the points"
+
+    @classmethod
+    def from_points(cls, points):
+        """
+        Builds a PointArray from a sequence of Point objects
+
+        :param points: iterable of Point objects
+        :return: PointArray object
+        """
+        if isinstance(points, PointArray):
+            return points
+        points = list(points)
+        coords = np.array([(pt.x, pt.y, pt.z) for pt in points], dtype=float).reshape(-1, 3)
+        ids = None
+        if all(pt.id is not None for pt in points):
+            ids = np.array([pt.id for pt in points], dtype=np.int64)
+        return cls(coords, ids)
+
+    def __len__(self):
+        return len(self.coords)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) or isinstance(index, (list, np.ndarray)):
+            return self.take(index)
+        x, y, z = self.coords[index].tolist()
+        return Point(x, y, z, id=None if self.ids is None else int(self.ids[index]))
+
+    def __iter__(self):
+        ids = [None] * len(self) if self.ids is None else self.ids.tolist()
+        for (x, y, z), id in zip(self.coords.tolist(), ids):
+            yield Point(x, y, z, id=id)
+
+    def __repr__(self):
+        return 'PointArray({} points)'.format(len(self))
+
+    @property
+    def x(self) -> np.ndarray:
+        """X coordinates of the points"""
+        return self.coords[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        """Y coordinates of the points"""
+        return self.coords[:, 1]
+
+    @property
+    def z(self) -> np.ndarray:
+        """Z coordinates of the points"""
+        return self.coords[:, 2]
+
+    def take(self, indexes):
+        """
+        Gets some of the points
+
+        :param indexes: slice or array-like of ints with the positions of the points
+        :return: PointArray object
+        """
+        if not isinstance(indexes, slice):
+            indexes = np.asarray(indexes, dtype=np.intp)
+        return PointArray(self.coords[indexes], None if self.ids is None else self.ids[indexes])
+
+    def copy(self) -> list:
+        """
+        Gets the points as a list of Point objects, as list.copy does
+
+        :return: list of Point objects
+        """
+        return list(self)
+
+
+def get_coordinates(points) -> np.ndarray:
+    """
+    Gets the coordinates of a sequence of points, without building Point objects for PointArray objects
+
+    :param points: PointArray object or iterable of Point objects
+    :return: numpy array (points, 3) with X, Y and Z coordinates
+    """
+    if isinstance(points, PointArray):
+        return points.coords
+    return np.array([(pt.x, pt.y, pt.z) for pt in points], dtype=float).reshape(-1, 3)
+
 
 class VectorShape(object):
     """
@@ -57,11 +164,14 @@ class Shape3D(object):
 
         :return: Point object
         """
-        x = round(sum(value.x for attr, value in self.__dict__.items()) / len(self.__dict__.items()), 2)
-        y = round(sum(value.y for attr, value in self.__dict__.items()) / len(self.__dict__.items()), 2)
-        z = round(sum(value.z for attr, value in self.__dict__.items()) / len(self.__dict__.items()), 2)
-
-        return Point(x, y, z)
+        x = y = z = 0
+        for value in self.__dict__.values():
+            x += value.x
+            y += value.y
+            z += value.z
+        size = len(self.__dict__)
+
+        return Point(round(x / size, 2), round(y / size, 2), round(z / size, 2))
 
 
 def get_random_points(number: int, vshape: VectorShape) -> list:
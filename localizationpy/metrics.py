@@ -1,22 +1,42 @@
 import operator as op
 import warnings
+from collections.abc import Sequence
 import math
 import logging
 import statistics as st
+import time
 
+import numpy as np
+
+import localizationpy.engine as eng
+import localizationpy.fprint_index as fi
 import localizationpy.mapping as mp
+import localizationpy.parallel as par
 
 logger = logging.getLogger(__name__)
 
+# Number of mobile-fingerprint pairs processed at once when chunks are derived from the number of fingerprints
+# (see get_chunk_size). A float64 matrix of this size takes 32 MiB
+CHUNK_ELEMENTS = 1 << 22
+
 
 class Estimation(object):
     """Class holding the result of an estimation"""
-    def __init__(self, mpoint, fpoints=None, inputs=None):
+    def __init__(self, mpoint, fpoints=None, inputs=None, epoint=None, error=None):
+        """
+        :param mpoint: Point object of the estimated mobile
+        :param fpoints: list of Point objects of the fingerprints used in the estimation
+        :param inputs: [optional] list of EstimationInput objects
+        :param epoint: [optional] Point object with the center of fpoints, if already calculated (see get_estimations)
+        :param error: [optional] float with the error of epoint, if already calculated
+        """
         self.mpoint = mpoint
         if len(fpoints) > 0:
-            shape = mp.Shape3D(*fpoints)
-            self.epoint = shape.center
-            self.error = get_euclidean_distance(mpoint, shape.center)
+            if epoint is None:
+                epoint = mp.Shape3D(*fpoints).center
+                error = get_euclidean_distance(mpoint, epoint)
+            self.epoint = epoint
+            self.error = error
             self.estimated = True
         else:
             self.epoint = None
@@ -69,6 +89,246 @@ class PowerMeasure(object):
         return ', '.join('%s: %s' % t for t in zip(self.__dict__, self.__dict__.values()))
 
 
+class FingerprintPowers(object):
+    """Class holding the powers of the fingerprints used in an estimation run, shared by all its estimations"""
+    def __init__(self, fpoints, aerials, fpowers):
+        """
+        :param fpoints: list of Point objects of the fingerprints
+        :param aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
+        :param fpowers: numpy array (fingerprints, aerials) with the powers of the fingerprints
+        """
+        self.fpoints = fpoints
+        self.aerials = aerials
+        self.fpowers = fpowers
+        self.__coords = None
+        self.__point_index = None
+
+    def get_coordinates(self) -> np.ndarray:
+        """Gets the coordinates of the fingerprints (see mapping.get_coordinates), calculated once"""
+        if self.__coords is None:
+            self.__coords = mp.get_coordinates(self.fpoints)
+        return self.__coords
+
+    def get_point_index(self) -> fi.PointIndex:
+        """Gets the spatial index over the coordinates of the fingerprints (see fprint_index.PointIndex), built once"""
+        if self.__point_index is None:
+            self.__point_index = fi.PointIndex(self.get_coordinates())
+        return self.__point_index
+
+
+class EstimationInputs(Sequence):
+    """
+    Read-only sequence holding the inputs of an estimation, one EstimationInput per fingerprint.
+    Only the powers of the mobile are stored, EstimationInput and PowerMeasure objects are built when accessed.
+    """
+    def __init__(self, mpoint, mpowers, fprint_powers: FingerprintPowers, threshold=None):
+        """
+        :param mpoint: Point object for the target mobile
+        :param mpowers: numpy array (aerials) with the powers of the mobile
+        :param fprint_powers: FingerprintPowers object with the powers of the fingerprints
+        :param threshold: [optional] float number used to check if power measures are in threshold (fuzzymap)
+        """
+        self.mpoint = mpoint
+        self.mpowers = mpowers
+        self.fprint_powers = fprint_powers
+        self.threshold = threshold
+
+    def __len__(self):
+        return len(self.fprint_powers.fpoints)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Estimation input index out of range")
+
+        fpowers = self.fprint_powers.fpowers[index]
+        power_measures = list()
+        for col, aerial in enumerate(self.fprint_powers.aerials):
+            mpower = float(self.mpowers[col])
+            if mpower == eng.INFINITE_POWER:
+                continue
+            pw_measure = PowerMeasure(aerial, mpower, float(fpowers[col]))
+            if self.threshold is not None:
+                pw_measure.in_threshold = check_threshold(pw_measure.fpower, pw_measure.mpower, self.threshold)
+            power_measures.append(pw_measure)
+
+        est_input = EstimationInput(mpoint=self.mpoint, fpoint=self.fprint_powers.fpoints[index],
+                                    power_measures=power_measures)
+        est_input.ed = float('%.2f' % sum(pwm.distance for pwm in est_input.power_measures))
+        return est_input
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class EstimationSession(object):
+    """
+    Class holding a mobile and a fingerprint simulation to run several estimations over them (numpy engine).
+    Per aerial power distances (raytracing) and threshold candidates (fuzzymap) between every mobile and every
+    fingerprint are calculated the first time an aerial is used and cached, so estimations over different subsets of
+    aerials are answered by combining the cached matrices.
+
+    Every cached matrix has shape (mobiles, fingerprints), so memory use grows with the number of aerials (and
+    thresholds) used. Points of the simulations are taken when the session is created, later changes of their
+    cohorts (see Simulation.cohort_points) do not affect the session.
+    """
+    def __init__(self, mobile_sim, fprint_sim):
+        """
+        :param mobile_sim: Simulation object containing the info of the points to estimate
+        :param fprint_sim: Simulation object containing the info of the fingerprints
+        """
+        self.mobile_sim = mobile_sim
+        self.fprint_sim = fprint_sim
+        # Cohorts holding the points in use, so points and powers keep matching if the active cohort changes
+        self.mobile_view = mobile_sim.cohort([pt.id for pt in mobile_sim.points])
+        self.fprint_view = fprint_sim.cohort([pt.id for pt in fprint_sim.points])
+        self.mpoints = list(self.mobile_view.points)
+        self.fpoints = list(self.fprint_view.points)
+        self.__mpowers = dict()
+        self.__fpowers = dict()
+        self.__distances = dict()
+        self.__candidates = dict()
+        self.__id_index = None
+
+    def __repr__(self):
+        return (f'Estimation session\r\n'
+                f'------------------------------\r\n'
+                f'\tMobiles: {self.mobile_sim.name!r}\r\n'
+                f'\tFingerprints: {self.fprint_sim.name!r}\r\n')
+
+    def __get_powers(self, aerial: str, dbm):
+        key = (aerial, bool(dbm))
+        if key not in self.__mpowers:
+            self.__mpowers[key] = np.asarray(self.mobile_view.get_powers(aerial, dbm), dtype=float)
+            self.__fpowers[key] = np.asarray(self.fprint_view.get_powers(aerial, dbm), dtype=float)
+        return self.__mpowers[key], self.__fpowers[key]
+
+    def __get_aerial_distances(self, aerial: str, dbm) -> np.ndarray:
+        key = (aerial, bool(dbm))
+        distances = self.__distances.get(key)
+        if distances is None:
+            distances = eng.get_aerial_power_distances(*self.__get_powers(aerial, dbm))
+            self.__distances[key] = distances
+        return distances
+
+    def __get_aerial_candidates(self, aerial: str, threshold: float, dbm) -> np.ndarray:
+        key = (aerial, threshold, bool(dbm))
+        candidates = self.__candidates.get(key)
+        if candidates is None:
+            mpower, fpower = self.__get_powers(aerial, dbm)
+            candidates = eng.pack_candidates(eng.get_aerial_candidates(mpower, fpower, threshold))
+            self.__candidates[key] = candidates
+        return candidates
+
+    def get_rows(self, points_ids=None) -> np.ndarray:
+        """
+        Gets the rows of the mobiles matching the given ids, following mobile points order (as cohorts do)
+
+        :param points_ids: [optional] list of int with the ids of the mobiles. If None or empty, all mobiles are used
+        :return: numpy array of ints with the rows
+        """
+        if not points_ids:
+            return np.arange(len(self.mpoints))
+        if self.__id_index is None:
+            self.__id_index = dict()
+            for row, pt in enumerate(self.mpoints):
+                self.__id_index.setdefault(pt.id, row)
+        return np.unique(np.fromiter((self.__id_index[pid] for pid in set(points_ids) if pid in self.__id_index),
+                                     dtype=np.intp))
+
+    def get_power_distances(self, aerials: list, dbm=True, rows=None) -> np.ndarray:
+        """
+        Gets the power distances of the mobiles for a subset of aerials, see engine.get_power_distances
+
+        :param aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
+        :param dbm: bool specifying power units (True for using dBm)
+        :param rows: [optional] numpy array of ints with the rows of the mobiles (see get_rows). If None, all of them
+        :return: numpy array (mobiles, fingerprints) with the power distances
+        """
+        if rows is None:
+            rows = np.arange(len(self.mpoints))
+        return eng.sum_power_distances((self.__get_aerial_distances(aerial, dbm)[rows] for aerial in aerials),
+                                       (len(rows), len(self.fpoints)))
+
+    def get_threshold_bits(self, aerials: list, threshold: float, dbm=True, rows=None) -> np.ndarray:
+        """
+        Gets the fingerprints falling into the threshold of the mobiles for a subset of aerials, as packed bitsets
+        (see engine.get_threshold_bits)
+
+        :param aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
+        :param threshold: float number in which power values will be checked
+        :param dbm: bool specifying power units (True for using dBm)
+        :param rows: [optional] numpy array of ints with the rows of the mobiles (see get_rows). If None, all of them
+        :return: numpy array of uint64 (mobiles, words)
+        """
+        if rows is None:
+            rows = np.arange(len(self.mpoints))
+        return eng.intersect_candidate_bits((self.__get_aerial_candidates(aerial, threshold, dbm)[rows]
+                                             for aerial in aerials), (len(rows), len(self.fpoints)))
+
+    def get_estimation(self, model, **kwargs) -> list:
+        """
+        Calculates an estimation reusing the cached matrices. Results match metrics.get_estimation.
+
+        :param model: string specifying the approach taken ('raytracing' or 'fuzzymap')
+        :key aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
+        :key threshold: float number in which power values will be checked for fuzzymap model
+        :key fprints_used: int number to specify the number of fingerprints to use when estimating the decision polygon
+        :key points: list[int] holding the ids of the points to estimate
+        :key dbm: bool specifying power units (True for using dBm)
+        :return: list of Estimation objects
+        """
+        assert model in {'raytracing', 'fuzzymap'}, "Specified model is not supported"
+        # Sessions always run the numpy engine in this process, so engine, workers and index are not supported
+        unsupported = set(kwargs) - {'aerials', 'threshold', 'fprints_used', 'points', 'dbm'}
+        assert len(unsupported) == 0, "Options not supported by an estimation session: {}".format(sorted(unsupported))
+
+        logger.debug('Running {} estimation (session): '.format(model) + ' ' + str(kwargs))
+
+        aerials = kwargs.get("aerials")
+        assert isinstance(aerials, list)
+        if len(aerials) == 0:
+            aerials = [a for a in self.mobile_view.aerial_measures.keys()]
+        points_ids = kwargs.get("points")
+        assert isinstance(points_ids, list)
+        dbm = kwargs.get('dbm')
+
+        rows = self.get_rows(points_ids)
+        mpowers = np.empty((len(rows), len(aerials)), dtype=float)
+        fpowers = np.empty((len(self.fpoints), len(aerials)), dtype=float)
+        for col, aerial in enumerate(aerials):
+            mpower, fpower = self.__get_powers(aerial, dbm)
+            mpowers[:, col] = mpower[rows]
+            fpowers[:, col] = fpower
+        fprint_powers = FingerprintPowers(self.fpoints, aerials, fpowers)
+        mpoints = [self.mpoints[row] for row in rows]
+
+        if model == 'raytracing':
+            distances = self.get_power_distances(aerials, dbm=dbm, rows=rows)
+            nearest = eng.get_nearest_indexes(distances, kwargs.get("fprints_used", 4))
+            estimation = list(_estimation_generator(mpoints, mpowers, fprint_powers, nearest))
+        else:
+            threshold = kwargs.get('threshold', 0.5)
+            bits = self.get_threshold_bits(aerials, threshold, dbm=dbm, rows=rows)
+            selections = eng.get_candidate_indexes(bits, len(self.fpoints))
+            estimation = list(_estimation_generator(mpoints, mpowers, fprint_powers, selections, threshold=threshold))
+
+        if len(estimation) == 0:
+            logger.warning("Simulation for specified values produced no estimation".format())
+
+        return estimation
+
+    def clear(self):
+        """Discards the cached powers and matrices"""
+        self.__mpowers.clear()
+        self.__fpowers.clear()
+        self.__distances.clear()
+        self.__candidates.clear()
+
+
 def get_euclidean_distance(a: mp.Point, b: mp.Point) -> float:
     """
     Calculates the euclidean distance between two given points
@@ -77,35 +337,83 @@ def get_euclidean_distance(a: mp.Point, b: mp.Point) -> float:
     :param b: Point object containing coordinates of b point
     :return: float value of the euclidean distance
     """
-    return float('%.2f' % math.sqrt(math.fsum([math.pow(b.x - a.x, 2),
-                                               math.pow(b.y - a.y, 2),
-                                               math.pow(b.z - a.z, 2)])))
+    return round(math.sqrt(math.fsum([math.pow(b.x - a.x, 2),
+                                      math.pow(b.y - a.y, 2),
+                                      math.pow(b.z - a.z, 2)])), 2)
+
+
+def get_euclidean_distances(a_points, b_points, decimals=2) -> np.ndarray:
+    """
+    Calculates the euclidean distances between every point of a list and every point of another one at once.
+    Rounded distances are the very same get_euclidean_distance gives for every pair.
+
+    :param a_points: PointArray object or list of Point objects
+    :param b_points: PointArray object or list of Point objects
+    :param decimals: [optional] int number of decimals to round the distances to. If None, they are not rounded
+    :return: numpy array (a points, b points) with the distances
+    """
+    return eng.get_pairwise_distances(mp.get_coordinates(a_points), mp.get_coordinates(b_points), decimals=decimals)
+
+
+def get_nearest_points(points, point_map, decimals=2, chunk_size=1000):
+    """
+    Gets the nearest point of a map to every point of a list. Ties are solved by the position in the map.
+
+    :param points: PointArray object or list of Point objects to be matched with the map
+    :param point_map: PointArray object or list of Point objects representing the fixed map
+    :param decimals: [optional] int number of decimals distances are rounded to before comparing them
+    :param chunk_size: int maximum number of points whose distances are calculated at once
+    :return: numpy array of ints with the positions of the nearest points in the map, numpy array of floats with
+             their distances (following points order)
+    """
+    coords = mp.get_coordinates(points)
+    map_coords = mp.get_coordinates(point_map)
+    assert map_coords.shape[0] > 0, "Map must contain at least one point"
+    indexes = np.empty(coords.shape[0], dtype=np.intp)
+    distances = np.empty(coords.shape[0], dtype=float)
+    for start, stop in __get_chunks(coords.shape[0], chunk_size):
+        chunk = eng.get_pairwise_distances(coords[start:stop], map_coords, decimals=decimals)
+        indexes[start:stop] = np.argmin(chunk, axis=1)
+        distances[start:stop] = chunk[np.arange(stop - start), indexes[start:stop]]
+    return indexes, distances
+
+
+def get_min_ed_distances(points, point_map, decimals=2, chunk_size=1000):
+    """
+    Array version of get_min_ed_distance: gets all the points of a map at the min distance of every point of a list
+
+    :param points: PointArray object or list of Point objects to be matched with the map
+    :param point_map: PointArray object or list of Point objects representing the fixed map
+    :param decimals: [optional] int number of decimals distances are rounded to before comparing them
+    :param chunk_size: int maximum number of points whose distances are calculated at once
+    :return: list of numpy arrays of ints with the positions in the map of the points fitting the min distance,
+             numpy array of floats with that min distance (following points order)
+    """
+    coords = mp.get_coordinates(points)
+    map_coords = mp.get_coordinates(point_map)
+    assert map_coords.shape[0] > 0, "Map must contain at least one point"
+    selections = list()
+    distances = np.empty(coords.shape[0], dtype=float)
+    for start, stop in __get_chunks(coords.shape[0], chunk_size):
+        chunk = eng.get_pairwise_distances(coords[start:stop], map_coords, decimals=decimals)
+        distances[start:stop] = chunk.min(axis=1)
+        selections.extend(np.flatnonzero(row == dist) for row, dist in zip(chunk, distances[start:stop]))
+    return selections, distances
 
 
 def get_min_ed_distance(a: mp.Point, point_map: list):
     """
     Gets the min distance between a given point and a list of points (map).
-    All euclidean distances are calculated one by one between "a" and every other point in the list.
+    Euclidean distances between "a" and every point in the list are calculated at once (see get_min_ed_distances).
 
     :param a: Point object to be matched with the given list
     :param point_map: list of Point objects representing the fixed map to search for the min distance
     :return: list of Point objects fitting the min ed distance, float value with that min ed distance
     """
-    ed_distances = []
-    min_dist = None
-    res_points = []
-    for point in point_map:
-        current_dist = get_euclidean_distance(a, point)
-        ed_distances.append((current_dist, point))
-
-        if min_dist is None or current_dist < min_dist:
-            min_dist = current_dist
-
-    for entry in ed_distances:
-        if entry[0] == min_dist:
-            res_points.append(entry[1])
-
-    return res_points, min_dist
+    if len(point_map) == 0:
+        return [], None
+    selections, distances = get_min_ed_distances([a], point_map)
+    return [point_map[idx] for idx in selections[0].tolist()], float(distances[0])
 
 
 def get_complex_module(z: complex):
@@ -190,7 +498,8 @@ def __estimation_input_generator(aerials, fprint_sim, mobile_sim, mpoint, dbm):
         yield est_input
 
 
-def get_raytracing_estimation(mobile_sim, fprint_sim, aerials, fprints_used=4, dbm=True):
+def get_raytracing_estimation(mobile_sim, fprint_sim, aerials, fprints_used=4, dbm=True, engine='numpy',
+                              workers=None, index=None, chunk_size=None):
     """
     Calculates the position of a list of points, following a ray-tracing approach.
 
@@ -199,9 +508,74 @@ def get_raytracing_estimation(mobile_sim, fprint_sim, aerials, fprints_used=4, d
     :param aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
     :param fprints_used: int number of fingerprints to be used
     :param dbm: bool specifying power units (True for using dBm)
+    :param engine: string specifying the implementation used ('numpy' or 'python'). Both give the same results,
+                   'python' walks every mobile-fingerprint-aerial measure one by one.
+    :param workers: [optional] int number of processes used by the 'numpy' engine. If greater than 1, mobiles are
+                    sharded across a pool of processes (see parallel.get_nearest_indexes)
+    :param index: [optional] FingerprintIndex (exact) or PartitionIndex (approximate, IVFIndex or GridIndex) object
+                  built over fprint_sim for the same aerials and units, used by the 'numpy' engine to find the
+                  nearest fingerprints instead of comparing against all of them. It can not be used along with workers
+    :param chunk_size: [optional] int number of mobiles processed at once by the 'numpy' engine. If None, it is
+                       derived from the number of fingerprints (see get_chunk_size)
     :return:
     """
+    __check_engine_options('raytracing', engine, workers=workers, index=index)
+
+    if engine == 'python':
+        return __get_raytracing_estimation_python(mobile_sim, fprint_sim, aerials, fprints_used, dbm)
+
+    if workers is not None and workers > 1:
+        if aerials is None:
+            aerials = [entry for entry in mobile_sim.aerial_measures]
+        mpowers, fprint_powers = __get_estimation_powers(mobile_sim, fprint_sim, aerials, dbm)
+        nearest = par.get_nearest_indexes(mpowers, fprint_powers.fpowers, fprints_used, workers=workers)
+        return list(_estimation_generator(mobile_sim.points, mpowers, fprint_powers, nearest))
+
+    return list(iter_raytracing_estimation(mobile_sim, fprint_sim, aerials, fprints_used=fprints_used, dbm=dbm,
+                                           chunk_size=chunk_size, index=index))
+
+
+def iter_raytracing_estimation(mobile_sim, fprint_sim, aerials, fprints_used=4, dbm=True, chunk_size=None,
+                               index=None):
+    """
+    Generator version of get_raytracing_estimation (numpy engine). Mobiles are processed in chunks and their
+    estimations are yielded as soon as every chunk is finished, so memory use is bounded by the chunk size.
+
+    :param mobile_sim: Simulation object containing the info of the points to estimate
+    :param fprint_sim: Simulation object containing the info of the fingerprints
+    :param aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
+    :param fprints_used: int number of fingerprints to be used
+    :param dbm: bool specifying power units (True for using dBm)
+    :param chunk_size: [optional] int number of mobiles processed at once. If None, it is derived from the number of
+                       fingerprints, so every chunk holds about CHUNK_ELEMENTS distances (see get_chunk_size)
+    :param index: [optional] index object used to find the nearest fingerprints, see get_raytracing_estimation
+    :return: generator of Estimation objects, following mobile_sim points order
+    """
+    if aerials is None:
+        aerials = [entry for entry in mobile_sim.aerial_measures]
+
+    mpoints = mobile_sim.points
+    if index is not None:
+        assert index.fprint_sim is fprint_sim and index.aerials == aerials and bool(index.dbm) == bool(dbm), \
+            "Fingerprint index does not match the estimation"
+        mpowers = eng.get_power_matrix(mobile_sim, aerials, dbm)
+        fprint_powers = FingerprintPowers(index.fpoints, aerials, index.fpowers)
+    else:
+        mpowers, fprint_powers = __get_estimation_powers(mobile_sim, fprint_sim, aerials, dbm)
+
+    for start, stop in __get_chunks(len(mpoints), get_chunk_size(len(fprint_powers.fpoints), chunk_size)):
+        if index is not None:
+            nearest = index.query(mpowers[start:stop], fprints_used)
+        else:
+            distances = eng.get_power_distances(mpowers[start:stop], fprint_powers.fpowers)
+            nearest = eng.get_nearest_indexes(distances, fprints_used)
+        yield from _estimation_generator(mpoints[start:stop], mpowers[start:stop], fprint_powers, nearest)
+
 
+def __get_raytracing_estimation_python(mobile_sim, fprint_sim, aerials, fprints_used, dbm):
+    """
+    Pure python implementation of get_raytracing_estimation, see its documentation.
+    """
     power_eds = __calculate_power_ed(mobile_sim, fprint_sim, aerials, dbm)
 
     estimations = list()
@@ -217,7 +591,8 @@ def get_raytracing_estimation(mobile_sim, fprint_sim, aerials, fprints_used=4, d
     return estimations
 
 
-def get_fuzzymap_estimation(mobile_sim, fprint_sim, aerials=None, threshold=0.5, dbm=True):
+def get_fuzzymap_estimation(mobile_sim, fprint_sim, aerials=None, threshold=0.5, dbm=True, engine='numpy',
+                            workers=None, chunk_size=None):
     """
     Calculates the position of a list of points, following a fuzzy-map approach.
 
@@ -226,24 +601,344 @@ def get_fuzzymap_estimation(mobile_sim, fprint_sim, aerials=None, threshold=0.5,
     :param aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
     :param threshold: float number in which power values will be checked
     :param dbm: bool specifying power units (True for using dBm)
+    :param engine: string specifying the implementation used ('numpy' or 'python'). 'numpy' checks the threshold for
+                   all mobiles and fingerprints at once with one boolean mask per aerial.
+    :param workers: [optional] int number of processes used by the 'numpy' engine. If greater than 1, mobiles are
+                    sharded across a pool of processes (see parallel.get_threshold_indexes)
+    :param chunk_size: [optional] int number of mobiles processed at once by the 'numpy' engine. If None, it is
+                       derived from the number of fingerprints (see get_chunk_size)
     :return:
     """
+    __check_engine_options('fuzzymap', engine, workers=workers)
+
+    if engine == 'python':
+        return __get_fuzzymap_estimation_python(mobile_sim, fprint_sim, aerials, threshold, dbm)
+
+    if workers is not None and workers > 1:
+        if aerials is None:
+            aerials = [entry for entry in mobile_sim.aerial_measures]
+        mpowers, fprint_powers = __get_estimation_powers(mobile_sim, fprint_sim, aerials, dbm)
+        selections = par.get_threshold_indexes(mpowers, fprint_powers.fpowers, threshold, workers=workers)
+        return list(_estimation_generator(mobile_sim.points, mpowers, fprint_powers, selections,
+                                           threshold=threshold))
+
+    return list(iter_fuzzymap_estimation(mobile_sim, fprint_sim, aerials, threshold=threshold, dbm=dbm,
+                                         chunk_size=chunk_size))
+
+
+def iter_fuzzymap_estimation(mobile_sim, fprint_sim, aerials=None, threshold=0.5, dbm=True, chunk_size=None):
+    """
+    Generator version of get_fuzzymap_estimation (numpy engine). Mobiles are processed in chunks and their
+    estimations are yielded as soon as every chunk is finished, so memory use is bounded by the chunk size.
+
+    :param mobile_sim: Simulation object containing the info of the points to estimate
+    :param fprint_sim: Simulation object containing the info of the fingerprints
+    :param aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
+    :param threshold: float number in which power values will be checked
+    :param dbm: bool specifying power units (True for using dBm)
+    :param chunk_size: [optional] int number of mobiles processed at once. If None, it is derived from the number of
+                       fingerprints, so every chunk holds about CHUNK_ELEMENTS distances (see get_chunk_size)
+    :return: generator of Estimation objects, following mobile_sim points order
+    """
+    if aerials is None:
+        aerials = [entry for entry in mobile_sim.aerial_measures]
+
+    mpoints = mobile_sim.points
+    mpowers, fprint_powers = __get_estimation_powers(mobile_sim, fprint_sim, aerials, dbm)
+
+    for start, stop in __get_chunks(len(mpoints), get_chunk_size(len(fprint_powers.fpoints), chunk_size)):
+        bits = eng.get_threshold_bits(mpowers[start:stop], fprint_powers.fpowers, threshold)
+        selections = eng.get_candidate_indexes(bits, len(fprint_powers.fpoints))
+        yield from _estimation_generator(mpoints[start:stop], mpowers[start:stop], fprint_powers, selections,
+                                          threshold=threshold)
+
+
+def __get_estimation_powers(mobile_sim, fprint_sim, aerials, dbm):
+    """
+    Auxiliary function to get the power matrices used by the numpy engine
+
+    :return: tuple (numpy array (mobiles, aerials) with the powers of the mobiles, FingerprintPowers object)
+    """
+    mpowers = eng.get_power_matrix(mobile_sim, aerials, dbm)
+    fpowers = eng.get_power_matrix(fprint_sim, aerials, dbm)
+    return mpowers, FingerprintPowers(fprint_sim.points, aerials, fpowers)
+
+
+def _estimation_generator(mpoints, mpowers, fprint_powers, selections, threshold=None):
+    """
+    Generator auxiliary function to build the Estimation objects of the numpy engine
+
+    :param mpoints: list of Point objects of the mobiles
+    :param mpowers: numpy array (mobiles, aerials) with the powers of the mobiles
+    :param fprint_powers: FingerprintPowers object with the powers of the fingerprints
+    :param selections: iterable with the indexes of the fingerprints selected for every mobile
+    :param threshold: [optional] float number used to check if power measures are in threshold (fuzzymap)
+    :return: generator of Estimation objects
+    """
+    inputs = (EstimationInputs(mpoint, mpower, fprint_powers, threshold=threshold)
+              for mpoint, mpower in zip(mpoints, mpowers))
+    yield from get_estimations(mpoints, fprint_powers.fpoints, selections, inputs=inputs,
+                               fcoords=fprint_powers.get_coordinates())
+
+
+def get_estimations(mpoints, fpoints, selections, inputs=None, fcoords=None) -> list:
+    """
+    Builds the Estimation objects of several mobiles at once. Centers and errors of all of them are calculated in a
+    single vectorized step (see engine.get_centers and engine.get_point_distances), giving the same results as
+    building every Estimation on its own.
+
+    :param mpoints: list (or PointArray) of Point objects of the mobiles
+    :param fpoints: list (or PointArray) of Point objects of the fingerprints
+    :param selections: numpy array of ints (mobiles, k) or list of arrays of ints with the positions of the
+                       fingerprints selected for every mobile
+    :param inputs: [optional] iterable with the inputs of every mobile
+    :param fcoords: [optional] numpy array (fingerprints, 3) with the coordinates of fpoints, if already calculated
+    :return: list of Estimation objects
+    """
+    if not isinstance(selections, np.ndarray):
+        selections = list(selections)
+    if fcoords is None:
+        fcoords = mp.get_coordinates(fpoints)
+    centers = eng.get_centers(fcoords, selections)
+    errors = eng.get_point_distances(mp.get_coordinates(mpoints), centers)
+    if inputs is None:
+        inputs = [None] * len(selections)
+
+    estimations = list()
+    for mpoint, indexes, center, error, est_inputs in zip(mpoints, selections, centers.tolist(), errors.tolist(),
+                                                          inputs):
+        if len(indexes) > 0:
+            estimations.append(Estimation(mpoint, [fpoints[j] for j in indexes], inputs=est_inputs,
+                                          epoint=mp.Point(*center), error=error))
+        else:
+            estimations.append(Estimation(mpoint, [], inputs=est_inputs))
+    return estimations
+
+
+def get_fuzzymap_threshold_sweep(mobile_sim, fprint_sim, thresholds, aerials=None, dbm=True, chunk_size=None) -> dict:
+    """
+    Calculates fuzzy-map estimations for several thresholds at once. Power differences are calculated a single time,
+    getting for every mobile and fingerprint the smallest threshold making it a candidate
+    (see engine.get_threshold_levels), so the fingerprints of every threshold are derived from them.
+    Results match get_fuzzymap_estimation called once per threshold.
+
+    :param mobile_sim: Simulation object containing the info of the points to estimate
+    :param fprint_sim: Simulation object containing the info of the fingerprints
+    :param thresholds: iterable of float numbers in which power values will be checked (ex: a list or numpy.arange)
+    :param aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
+    :param dbm: bool specifying power units (True for using dBm)
+    :param chunk_size: [optional] int number of mobiles processed at once. If None, it is derived from the number of
+                       fingerprints, so every chunk holds about CHUNK_ELEMENTS distances (see get_chunk_size)
+    :return: dict of threshold and dict with its "estimations" (list of Estimation objects), "mae" and "stdev"
+             (-1 if they can not be calculated), following thresholds order
+    """
+    if aerials is None:
+        aerials = [entry for entry in mobile_sim.aerial_measures]
+    thresholds = [float(th) for th in thresholds]
+    order = np.argsort(thresholds, kind='stable')
+    sorted_thresholds = np.asarray(thresholds, dtype=float)[order]
+
+    mpoints = mobile_sim.points
+    mpowers, fprint_powers = __get_estimation_powers(mobile_sim, fprint_sim, aerials, dbm)
+    fpowers = fprint_powers.fpowers
+    estimations = {th: list() for th in thresholds}
+
+    for start, stop in __get_chunks(len(mpoints), get_chunk_size(len(fprint_powers.fpoints), chunk_size)):
+        levels = [eng.get_threshold_levels(mpowers[start:stop, col], fpowers[:, col], sorted_thresholds)
+                  for col in range(len(aerials))]
+        for pos, th in zip(order, sorted_thresholds):
+            if len(estimations[thresholds[pos]]) >= stop:
+                # Repeated threshold, already estimated
+                continue
+            level = np.searchsorted(sorted_thresholds, th, side='right') - 1
+            aerial_bits = (eng.pack_candidates(aerial_levels <= level) for aerial_levels in levels)
+            bits = eng.intersect_candidate_bits(aerial_bits, (stop - start, len(fprint_powers.fpoints)))
+            selections = eng.get_candidate_indexes(bits, len(fprint_powers.fpoints))
+            estimations[thresholds[pos]].extend(_estimation_generator(mpoints[start:stop], mpowers[start:stop],
+                                                                      fprint_powers, selections, threshold=th))
+
+    results = dict()
+    for th, est in estimations.items():
+        # stdev needs at least two estimated points
+        stdev = get_stdev(est) if sum(1 for e in est if e.estimated) > 1 else -1
+        results[th] = {"estimations": est, "mae": get_mae(est), "stdev": stdev}
+    return results
+
+
+def get_raytracing_k_sweep(mobile_sim, fprint_sim, aerials, k_max: int, dbm=True, chunk_size=None) -> dict:
+    """
+    Calculates the errors of ray-tracing estimations using from 1 to k_max fingerprints at once. Nearest fingerprints
+    are selected a single time up to k_max, as the nearest k fingerprints are the first k of them, and the centers of
+    every k are calculated from the cumulative sums of their coordinates.
+    Results match get_raytracing_estimation called once per k (fprints_used).
+
+    :param mobile_sim: Simulation object containing the info of the points to estimate
+    :param fprint_sim: Simulation object containing the info of the fingerprints
+    :param aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
+    :param k_max: int maximum number of fingerprints to be used
+    :param dbm: bool specifying power units (True for using dBm)
+    :param chunk_size: [optional] int number of mobiles processed at once. If None, it is derived from the number of
+                       fingerprints, so every chunk holds about CHUNK_ELEMENTS distances (see get_chunk_size)
+    :return: dict of k and dict with its "errors" (list of float errors, following mobile points order), "mae" and
+             "stdev" (-1 if they can not be calculated)
+    """
+    assert k_max > 0, "Number of fingerprints must be a positive number"
+    if aerials is None:
+        aerials = [entry for entry in mobile_sim.aerial_measures]
+
+    mpoints = mobile_sim.points
+    mpowers, fprint_powers = __get_estimation_powers(mobile_sim, fprint_sim, aerials, dbm)
+    mcoords = mp.get_coordinates(mpoints)
+    fcoords = fprint_powers.get_coordinates()
+    errors = {k: list() for k in range(1, k_max + 1)}
+
+    for start, stop in __get_chunks(len(mpoints), get_chunk_size(len(fprint_powers.fpoints), chunk_size)):
+        distances = eng.get_power_distances(mpowers[start:stop], fprint_powers.fpowers)
+        nearest = eng.get_nearest_indexes(distances, k_max)
+        if nearest.shape[1] == 0:
+            continue
+        # Coordinates are added in the same order as Shape3D.center does, so centers are the very same
+        sums = np.cumsum(fcoords[nearest], axis=1)
+        centers = eng.round_decimals(sums / np.arange(1, nearest.shape[1] + 1)[np.newaxis, :, np.newaxis], 2)
+        for k in errors:
+            col = min(k, nearest.shape[1]) - 1
+            errors[k].extend(eng.get_point_distances(mcoords[start:stop], centers[:, col]).tolist())
+
+    results = dict()
+    for k, err in errors.items():
+        results[k] = {
+            "errors": err,
+            "mae": st.mean(err) if len(err) > 0 else -1,
+            "stdev": st.stdev(err) if len(err) > 1 else -1,
+        }
+    return results
+
+
+def get_index_report(mobile_sim, fprint_sim, index, fprints_used=4, n_probes=None) -> list:
+    """
+    Measures an approximate fingerprint index (see fprint_index.PartitionIndex) against the exact numpy engine:
+    recall of the nearest fingerprints, MAE of the ray-tracing estimations and search times.
+
+    :param mobile_sim: Simulation object containing the info of the points to estimate
+    :param fprint_sim: Simulation object containing the info of the fingerprints
+    :param index: index object built over fprint_sim (IVFIndex, GridIndex or FingerprintIndex)
+    :param fprints_used: int number of fingerprints to be used
+    :param n_probes: [optional] list of int number of probed groups to measure (IVFIndex or GridIndex).
+                     If None, the index is measured as it is
+    :return: list of dicts (one per n_probe) holding "n_probe", "recall", "mae", "exact_mae", "mae_increase",
+             "time" and "exact_time" (seconds)
+    """
+    assert index.fprint_sim is fprint_sim, "Fingerprint index does not match the estimation"
+    mpoints = mobile_sim.points
+    mpowers = eng.get_power_matrix(mobile_sim, index.aerials, index.dbm)
+    fprint_powers = FingerprintPowers(index.fpoints, index.aerials, index.fpowers)
+
+    start = time.perf_counter()
+    exact_nearest = eng.get_nearest_indexes(eng.get_power_distances(mpowers, index.fpowers), fprints_used)
+    exact_time = time.perf_counter() - start
+    exact_mae = get_mae(list(_estimation_generator(mpoints, mpowers, fprint_powers, exact_nearest)))
+
+    reports = list()
+    for n_probe in (n_probes if n_probes is not None else [None]):
+        start = time.perf_counter()
+        if n_probe is None:
+            nearest = index.query(mpowers, fprints_used)
+        else:
+            nearest = index.query(mpowers, fprints_used, n_probe=n_probe)
+        elapsed = time.perf_counter() - start
+        mae = get_mae(list(_estimation_generator(mpoints, mpowers, fprint_powers, nearest)))
+        reports.append({
+            "n_probe": n_probe if n_probe is not None else getattr(index, 'n_probe', None),
+            "recall": fi.get_recall(nearest, exact_nearest),
+            "mae": mae,
+            "exact_mae": exact_mae,
+            "mae_increase": mae - exact_mae,
+            "time": elapsed,
+            "exact_time": exact_time,
+        })
+        logger.debug('Index report: ' + str(reports[-1]))
+
+    return reports
+
+
+def get_reduction_report(model, mobile_sim, fprint_sim, reduced_sim, **kwargs) -> dict:
+    """
+    Compares the estimations given by a reduced set of fingerprints (see fprint_index.reduce_fingerprints) against
+    the ones given by the full set.
+
+    :param model: string specifying the approach taken ('raytracing' or 'fuzzymap')
+    :param mobile_sim: Simulation object containing the info of the points to estimate
+    :param fprint_sim: Simulation object containing the full set of fingerprints
+    :param reduced_sim: Simulation (or SimulationCohort) object containing the reduced set of fingerprints
+    :key: same keyword arguments as get_estimation
+    :return: dict holding the number of fingerprints ("fprints", "reduced_fprints"), the "mae" and "stdev" of both
+             estimations ("reduced_mae", "reduced_stdev") and the "mae_increase"
+    """
+    full = get_estimation(model, mobile_sim, fprint_sim, **kwargs)
+    reduced = get_estimation(model, mobile_sim, reduced_sim, **kwargs)
+    report = {
+        "fprints": len(fprint_sim.points),
+        "reduced_fprints": len(reduced_sim.points),
+        "mae": get_mae(full),
+        "stdev": get_stdev(full) if sum(1 for e in full if e.estimated) > 1 else -1,
+        "reduced_mae": get_mae(reduced),
+        "reduced_stdev": get_stdev(reduced) if sum(1 for e in reduced if e.estimated) > 1 else -1,
+    }
+    report["mae_increase"] = report["reduced_mae"] - report["mae"]
+    logger.debug('Reduction report: ' + str(report))
+    return report
+
+
+def get_chunk_size(n_fprints: int, chunk_size=None) -> int:
+    """
+    Gets the number of mobiles processed at once by the chunked estimations, so memory use is bounded regardless of
+    the size of the fingerprint map
+
+    :param n_fprints: int number of fingerprints
+    :param chunk_size: [optional] int number of mobiles given by the caller, returned as is
+    :return: int chunk size, CHUNK_ELEMENTS // n_fprints (at least 1) if chunk_size is None
+    """
+    if chunk_size is None:
+        chunk_size = max(1, CHUNK_ELEMENTS // max(n_fprints, 1))
+    return chunk_size
+
+
+def __get_chunks(size: int, chunk_size=None):
+    """
+    Generator auxiliary function to split a number of elements in chunks
+
+    :param size: int number of elements
+    :param chunk_size: int maximum number of elements per chunk. If None, a single chunk is used
+    :return: generator of tuples (start, stop) of every chunk
+    """
+    if chunk_size is None:
+        chunk_size = max(size, 1)
+    assert chunk_size > 0, "Chunk size must be a positive number"
+    for start in range(0, size, chunk_size):
+        yield start, min(start + chunk_size, size)
+
+
+def __get_fuzzymap_estimation_python(mobile_sim, fprint_sim, aerials, threshold, dbm):
+    """
+    Pure python implementation of get_fuzzymap_estimation, see its documentation.
+    """
     estimations = list()
 
     for mpoint in mobile_sim.points:
+        # Candidates of every aerial are kept as bitsets (int) of the fingerprint positions within inputs
         powers = dict()
         inputs = list(__estimation_input_generator(aerials, fprint_sim, mobile_sim, mpoint, dbm))
         for aerial in aerials:
-            powers.update({aerial: []})
-        for einput in inputs:
+            powers.update({aerial: 0})
+        for idx, einput in enumerate(inputs):
             for pw_measure in einput.power_measures:
                 fpower = pw_measure.fpower
                 mpower = pw_measure.mpower
                 if check_threshold(fpower, mpower, threshold):
-                    powers[pw_measure.aerial].append(einput.fpoint)
+                    powers[pw_measure.aerial] |= 1 << idx
                     pw_measure.in_threshold = True
         if len(powers.values()) > 0:
-            fpoints = get_list_intersection([lst for lst in powers.values()])
+            fpoints = [inputs[idx].fpoint for idx in get_bitset_intersection(list(powers.values()))]
             estimations.append(Estimation(mpoint, fpoints, inputs=inputs))
         else:
             estimations.append(Estimation(mpoint, inputs=inputs))
@@ -251,18 +946,11 @@ def get_fuzzymap_estimation(mobile_sim, fprint_sim, aerials=None, threshold=0.5,
     return estimations
 
 
-def get_estimation(model, mobile_sim, fprint_sim, **kwargs):
+def __parse_estimation_kwargs(model, mobile_sim, kwargs):
     """
-    Calculates an estimation.
+    Auxiliary function to parse and check the keyword arguments of an estimation, see get_estimation.
 
-    :param model: string specifying the approach taken ('raytracing' or 'fuzzymap')
-    :param mobile_sim: Simulation object containing the info of the points to estimate
-    :param fprint_sim: Simulation object containing the info of the fingerprints
-    :key aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
-    :key threshold: float number in which power values will be checked for fuzzymap model
-    :key fprints_used: int number to specify the number of fingerprints to use when estimating the decision polygon
-    :key points: list[int] holding the ids of the points to estimate
-    :return:
+    :return: tuple (Simulation object or cohort with the mobiles to estimate, dict with the estimation parameters)
     """
     allowed_models = {'raytracing', 'fuzzymap'}
 
@@ -275,31 +963,116 @@ def get_estimation(model, mobile_sim, fprint_sim, **kwargs):
     if len(aerials) == 0:
         aerials = [a for a in mobile_sim.aerial_measures.keys()]
 
-    fprints_used = kwargs.get("fprints_used", 4)
-    threshold = kwargs.get('threshold', 0.5)
-
     points_ids = kwargs.get("points")
     assert isinstance(points_ids, list)
     if len(points_ids) != 0:
-        mobile_sim.cohort_points(points_ids)
+        # Cohort works on its own point selection, so the simulation itself is not modified
+        mobile_sim = mobile_sim.cohort(points_ids)
+
+    params = {
+        "aerials": aerials,
+        "fprints_used": kwargs.get("fprints_used", 4),
+        "threshold": kwargs.get('threshold', 0.5),
+        "dbm": kwargs.get('dbm'),
+        "engine": kwargs.get('engine', 'numpy'),
+        "workers": kwargs.get('workers'),
+        "index": kwargs.get('index'),
+        "chunk_size": kwargs.get('chunk_size'),
+    }
+    __check_engine_options(model, params["engine"], workers=params["workers"], index=params["index"])
+
+    return mobile_sim, params
+
+
+def __check_engine_options(model, engine, workers=None, index=None):
+    """
+    Auxiliary function to check that the engine options of an estimation are supported together, so none of them
+    is silently ignored
+    """
+    assert engine in {'numpy', 'python'}, "Specified engine is not supported"
+    parallel = workers is not None and workers > 1
+    assert engine == 'numpy' or (not parallel and index is None), \
+        "Workers and fingerprint index are only supported by the numpy engine"
+    assert index is None or model == 'raytracing', "Fingerprint index is only supported for raytracing model"
+    assert index is None or not parallel, "Workers are not supported along with a fingerprint index"
+
+
+def get_estimation(model, mobile_sim, fprint_sim, **kwargs):
+    """
+    Calculates an estimation.
+
+    :param model: string specifying the approach taken ('raytracing' or 'fuzzymap')
+    :param mobile_sim: Simulation object containing the info of the points to estimate
+    :param fprint_sim: Simulation object containing the info of the fingerprints
+    :key aerials: list of strings containing aerials ids (ex: ['1', '2', '4'])
+    :key threshold: float number in which power values will be checked for fuzzymap model
+    :key fprints_used: int number to specify the number of fingerprints to use when estimating the decision polygon
+    :key points: list[int] holding the ids of the points to estimate
+    :key engine: string specifying the implementation ('numpy' by default or 'python')
+    :key workers: int number of processes used to shard the mobiles (numpy engine), see parallel module
+    :key index: FingerprintIndex, IVFIndex or GridIndex object to find the nearest fingerprints for raytracing model
+                (numpy engine)
+    :key chunk_size: int number of mobiles processed at once (numpy engine), see get_chunk_size
+    :return:
+    """
+    mobile_sim, params = __parse_estimation_kwargs(model, mobile_sim, kwargs)
 
     estimation = []
 
     if model == 'raytracing':
-        estimation = get_raytracing_estimation(mobile_sim, fprint_sim, aerials, fprints_used=fprints_used,
-                                               dbm=kwargs.get('dbm'))
+        estimation = get_raytracing_estimation(mobile_sim, fprint_sim, params["aerials"],
+                                               fprints_used=params["fprints_used"], dbm=params["dbm"],
+                                               engine=params["engine"], workers=params["workers"],
+                                               index=params["index"], chunk_size=params["chunk_size"])
     elif model == 'fuzzymap':
-        estimation = get_fuzzymap_estimation(mobile_sim, fprint_sim, aerials, threshold=threshold,
-                                             dbm=kwargs.get('dbm'))
+        estimation = get_fuzzymap_estimation(mobile_sim, fprint_sim, params["aerials"], threshold=params["threshold"],
+                                             dbm=params["dbm"], engine=params["engine"], workers=params["workers"],
+                                             chunk_size=params["chunk_size"])
 
     if len(estimation) == 0:
         logger.warning("Simulation for specified values produced no estimation".format())
 
-    mobile_sim.cohort_points(restore=True)
-
     return estimation
 
 
+def iter_estimation(model, mobile_sim, fprint_sim, chunk_size=None, **kwargs):
+    """
+    Generator version of get_estimation, yielding Estimation objects as chunks of mobiles are finished.
+    It can be used along with file_manager.create_estimation_stream_files to estimate very large sets of mobiles
+    with bounded memory.
+
+    :param model: string specifying the approach taken ('raytracing' or 'fuzzymap')
+    :param mobile_sim: Simulation object containing the info of the points to estimate
+    :param fprint_sim: Simulation object containing the info of the fingerprints
+    :param chunk_size: [optional] int number of mobiles processed at once. If None, it is derived from the number of
+                       fingerprints (see get_chunk_size)
+    :key: same keyword arguments as get_estimation, except workers (mobiles are processed in this process)
+    :return: generator of Estimation objects, following mobile points order
+    """
+    mobile_sim, params = __parse_estimation_kwargs(model, mobile_sim, kwargs)
+    assert params["workers"] is None or params["workers"] <= 1, "Workers are not supported by iter_estimation"
+
+    if params["engine"] == 'python':
+        # Python engine runs over a cohort of every chunk of mobiles, so memory use is bounded as well
+        mpoints = mobile_sim.points
+        for start, stop in __get_chunks(len(mpoints), get_chunk_size(len(fprint_sim.points), chunk_size)):
+            chunk_sim = mobile_sim.cohort([pt.id for pt in mpoints[start:stop]])
+            if model == 'raytracing':
+                yield from get_raytracing_estimation(chunk_sim, fprint_sim, params["aerials"],
+                                                     fprints_used=params["fprints_used"], dbm=params["dbm"],
+                                                     engine='python')
+            else:
+                yield from get_fuzzymap_estimation(chunk_sim, fprint_sim, params["aerials"],
+                                                   threshold=params["threshold"], dbm=params["dbm"], engine='python')
+    elif model == 'raytracing':
+        yield from iter_raytracing_estimation(mobile_sim, fprint_sim, params["aerials"],
+                                              fprints_used=params["fprints_used"], dbm=params["dbm"],
+                                              chunk_size=chunk_size, index=params["index"])
+    else:
+        yield from iter_fuzzymap_estimation(mobile_sim, fprint_sim, params["aerials"], threshold=params["threshold"],
+                                            dbm=params["dbm"], chunk_size=chunk_size)
+
+
 def get_mae(estimations: list):
     """
     Calculates the minimun average error (mae) of an estimation
@@ -341,7 +1114,8 @@ def calculate_mae_rate(mae1: float, mae2: float):
 
 def get_list_intersection(d):
     """
-    Calculates the intersection of a list of lists [[1,2],[3,4],[3,1]]
+    Calculates the intersection of a list of lists [[1,2],[3,4],[3,1]].
+    Kept as public API, the python engine intersects bitsets instead (see get_bitset_intersection)
 
     :param d: list of list objects to intersect
     :return: list with intersected values
@@ -353,6 +1127,27 @@ def get_list_intersection(d):
         return []
 
 
+def get_bitset_intersection(bitsets: list) -> list:
+    """
+    Calculates the intersection of a list of bitsets (int), ignoring the empty ones as get_list_intersection does
+
+    :param bitsets: list of int, bit i set meaning that element i is in the set
+    :return: sorted list of int with the elements (bit positions) of the intersection
+    """
+    res = [bits for bits in bitsets if bits != 0]
+    if len(res) == 0:
+        return []
+    bits = res[0]
+    for other in res[1:]:
+        bits &= other
+    elements = list()
+    while bits:
+        low = bits & -bits
+        elements.append(low.bit_length() - 1)
+        bits ^= low
+    return elements
+
+
 def get_smallest_eds(distances, n):
     """DEPRECATED: Get the n smallest euclidean distances of a list"""
     return dict(sorted(distances.items(), key=op.itemgetter(1))[:n])
@@ -0,0 +1,118 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+import localizationpy.engine as eng
+
+# Arrays shared with the worker processes, attached once per worker (see __init_worker)
+_worker_memory = dict()
+_worker_arrays = dict()
+
+
+def get_nearest_indexes(mpowers: np.ndarray, fpowers: np.ndarray, n: int, workers=None, chunk_size=1000) -> list:
+    """
+    Parallel version of engine.get_nearest_indexes(engine.get_power_distances(mpowers, fpowers), n).
+    Mobiles are sharded across a pool of processes, which read the powers from shared memory.
+
+    :param mpowers: numpy array (mobiles, aerials) with the powers of the mobiles
+    :param fpowers: numpy array (fingerprints, aerials) with the powers of the fingerprints
+    :param n: int number of fingerprints to get per mobile
+    :param workers: [optional] int number of processes. If None, one per CPU core is used
+    :param chunk_size: int maximum number of mobiles processed by a single task
+    :return: list of numpy arrays of ints with the indexes of the nearest fingerprints, following mpowers order
+    """
+    return __run(__nearest_task, mpowers, fpowers, n, workers, chunk_size)
+
+
+def get_threshold_indexes(mpowers: np.ndarray, fpowers: np.ndarray, threshold: float, workers=None,
+                          chunk_size=1000) -> list:
+    """
+    Parallel version of engine.get_threshold_mask, returning the indexes of the selected fingerprints instead of the
+    whole mask. Mobiles are sharded across a pool of processes, which read the powers from shared memory.
+
+    :param mpowers: numpy array (mobiles, aerials) with the powers of the mobiles
+    :param fpowers: numpy array (fingerprints, aerials) with the powers of the fingerprints
+    :param threshold: float number in which power values will be checked
+    :param workers: [optional] int number of processes. If None, one per CPU core is used
+    :param chunk_size: int maximum number of mobiles processed by a single task
+    :return: list of numpy arrays of ints with the indexes of the selected fingerprints, following mpowers order
+    """
+    return __run(__threshold_task, mpowers, fpowers, threshold, workers, chunk_size)
+
+
+def get_shards(size: int, workers: int, chunk_size=1000) -> list:
+    """
+    Splits a number of mobiles in shards, so every worker gets several of them to balance the load
+
+    :param size: int number of mobiles
+    :param workers: int number of workers
+    :param chunk_size: int maximum number of mobiles per shard
+    :return: list of tuples (start, stop) of every shard
+    """
+    assert chunk_size > 0, "Chunk size must be a positive number"
+    shard_size = max(1, min(chunk_size, math.ceil(size / (4 * workers))))
+    return [(start, min(start + shard_size, size)) for start in range(0, size, shard_size)]
+
+
+def __run(task, mpowers, fpowers, arg, workers, chunk_size):
+    """
+    Runs a task over every shard of mobiles, in a pool of processes sharing the power matrices
+
+    :return: list with the results of every mobile, following mpowers order
+    """
+    mpowers = np.ascontiguousarray(mpowers, dtype=float)
+    fpowers = np.ascontiguousarray(fpowers, dtype=float)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    shards = get_shards(mpowers.shape[0], workers, chunk_size)
+
+    if workers <= 1 or len(shards) <= 1:
+        results = list()
+        for start, stop in shards:
+            results.extend(task(mpowers[start:stop], fpowers, arg))
+        return results
+
+    blocks = list()
+    try:
+        specs = dict()
+        for key, array in (('mpowers', mpowers), ('fpowers', fpowers)):
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            blocks.append(block)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            specs[key] = (block.name, array.shape, array.dtype.str)
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards)), initializer=__init_worker,
+                                 initargs=(specs,)) as pool:
+            results = list()
+            # map keeps the order of the shards, so results follow mobiles order
+            for shard_result in pool.map(__run_shard, [task] * len(shards), shards, [arg] * len(shards)):
+                results.extend(shard_result)
+        return results
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def __init_worker(specs: dict):
+    """Attaches a worker process to the shared power matrices"""
+    for key, (name, shape, dtype) in specs.items():
+        block = SharedMemory(name=name)
+        _worker_memory[key] = block
+        _worker_arrays[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+def __run_shard(task, shard, arg):
+    start, stop = shard
+    return task(_worker_arrays['mpowers'][start:stop], _worker_arrays['fpowers'], arg)
+
+
+def __nearest_task(mpowers, fpowers, n):
+    return list(eng.get_nearest_indexes(eng.get_power_distances(mpowers, fpowers), n))
+
+
+def __threshold_task(mpowers, fpowers, threshold):
+    return eng.get_candidate_indexes(eng.get_threshold_bits(mpowers, fpowers, threshold), fpowers.shape[0])
@@ -146,13 +146,14 @@ def __add_estimation_points(ax, estimations, fpoints):
 
     :param ax:  Matplotlib axis object that will be updated
     :param estimations: list containing Estimation objects
-    :param fpoints: list containing Point objects with the fingerprints
+    :param fpoints: list containing Point objects (or PointArray object) with the fingerprints
     :return: Matplotlib collection holding the mobiles points
     """
     estimations_x = [est.epoint.x for est in estimations if est.estimated]
     estimations_y = [est.epoint.y for est in estimations if est.estimated]
-    fpoints_x = [coord.x for coord in fpoints]
-    fpoints_y = [coord.y for coord in fpoints]
+    fpoints_coords = mp.get_coordinates(fpoints)
+    fpoints_x = fpoints_coords[:, 0]
+    fpoints_y = fpoints_coords[:, 1]
     mpoints_x = [est.mpoint.x for est in estimations]
     mpoints_y = [est.mpoint.y for est in estimations]
     ax.scatter(fpoints_x, fpoints_y, s=10, c='black', marker='x')
@@ -168,7 +169,7 @@ def plot_position_estimation(ax, fpoints, estimations, **kwargs):
     Add a subplot to given figure containing the position estimations of mobile points.
 
     :param ax:  Matplotlib axis object that will be updated
-    :param fpoints: list of Point objects containing the fingerprints of the simulation
+    :param fpoints: list of Point objects (or PointArray object) containing the fingerprints of the simulation
     :param estimations: list containing Estimation objects
     :key escolor: string containing the desired color for the shape
     :key plot_m_ids: bool if True plots mobile ids
@@ -253,15 +254,16 @@ def plot_estimation_powers(name, figure, fpowers, mpowers, fpoints, estimations)
     :param name: Name of the plot (ex: Aerial 1)
     :param fpowers: list of FieldValue.power for every fingerprint due to target aerial
     :param mpowers: list of FieldValue.power for every mobile due to target aerial
-    :param fpoints: list of Point objects containing the fingerprints of the simulation
+    :param fpoints: list of Point objects (or PointArray object) containing the fingerprints of the simulation
     :param estimations: list containing Estimation objects
     :param figure: matplotlib figure to add the plot
     """
 
     estimations_x = [est.epoint.x for est in estimations]
     estimations_y = [est.epoint.y for est in estimations]
-    fpoints_x = [coord.x for coord in fpoints]
-    fpoints_y = [coord.y for coord in fpoints]
+    fpoints_coords = mp.get_coordinates(fpoints)
+    fpoints_x = fpoints_coords[:, 0]
+    fpoints_y = fpoints_coords[:, 1]
     mpoints_x = [entry.mpoint.x for entry in estimations]
     mpoints_y = [entry.mpoint.y for entry in estimations]
 
@@ -1,8 +1,15 @@
 import os
 import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
 
 import localizationpy.aerial_measure as am
+import localizationpy.fieldvalue as fv
 import localizationpy.file_manager as fm
+import localizationpy.fprint_index as fi
+import localizationpy.mapping as mp
 
 
 class Simulation(object):
@@ -10,29 +17,96 @@ class Simulation(object):
     Class containing all the relative information of a simulation, including mapped points coordinates values and
     Electromagnetic field values for matching points
     """
-    def __init__(self, simulation_path: str):
+    def __init__(self, simulation_path: str, field_dtype=np.complex128, h_fields=False, use_cache=False,
+                 load_workers=None, load_executor='thread', lazy=False):
+        """
+        :param simulation_path: string with the path of the simulation folder
+        :param field_dtype: numpy complex dtype used to store the field values (np.complex128 or np.complex64)
+        :param h_fields: bool, if True magnetic field values are also loaded
+        :param use_cache: bool, if True parsed files are stored in a binary cache file within the simulation folder,
+                          so later simulations of the unchanged folder are loaded from it instead of parsing the files
+        :param load_workers: [optional] int number of workers used to parse the aerial files concurrently.
+                             If None or 1, files are parsed one after another
+        :param load_executor: string specifying the kind of workers used to parse the aerial files ('thread' or
+                              'process')
+        :param lazy: bool, if True aerial files are only parsed when their aerial is accessed for the first time
+                     (see aerial_measures). If use_cache is also True and there is no valid cache yet, all the files
+                     are parsed at once to build it
+        """
+        assert load_executor in {'thread', 'process'}, "Specified executor is not supported"
+
+        self.__options = dict(field_dtype=field_dtype, h_fields=h_fields, use_cache=use_cache,
+                              load_workers=load_workers, load_executor=load_executor, lazy=lazy)
+        self.__powers = dict()
+        self.cohorts = dict()
         self.simulation_path = simulation_path
         self.name = os.path.basename(simulation_path)
         aerial_paths = []
-        self.__points = []
-        for file in os.listdir(simulation_path):
+        points_path = None
+        points = mp.PointArray(np.empty((0, 3)), ids=np.empty(0, dtype=np.int64))
+        for file in sorted(os.listdir(simulation_path)):
             if file.endswith('.cer'):
                 aerial_paths.append(os.path.join(simulation_path, file))
             elif file.endswith('.dat'):
-                self.__points = fm._parse_file_puntos(os.path.join(simulation_path, file))
-        self.__original_points = self.__points.copy()
-        self.__build_aerial__measures(aerial_paths)
+                points_path = os.path.join(simulation_path, file)
+
+        file_paths = aerial_paths + ([points_path] if points_path is not None else [])
+        cache = None
+        if use_cache:
+            cache = fm._load_simulation_cache(simulation_path, file_paths, h_fields=h_fields)
+
+        if cache is not None:
+            aerials_data = [cache['aerials'][os.path.basename(path)] for path in aerial_paths]
+            if cache['points'] is not None:
+                points = cache['points']
+        else:
+            if points_path is not None:
+                points = fm._parse_file_puntos(points_path)
+            if lazy and not use_cache:
+                aerials_data = [None] * len(aerial_paths)
+            else:
+                aerials_data = self.__parse_aerial_files(aerial_paths, h_fields, load_workers, load_executor)
+            if use_cache:
+                fm._save_simulation_cache(simulation_path, file_paths,
+                                          points if points_path is not None else None,
+                                          {os.path.basename(path): data for path, data in
+                                           zip(aerial_paths, aerials_data)},
+                                          h_fields=h_fields)
+
+        self.__original_point_array = points
+        self.__original_points = None
+        self.__all_points = SimulationCohort(self)
+        self.__active = self.__all_points
+        self.__build_aerial__measures(aerial_paths, aerials_data, field_dtype, h_fields, lazy)
 
     def __repr__(self):
         return (f'Simulation: {self.name!r}\r\n'
                 f'------------------------------\r\n'                
                 f'\tPath: {self.simulation_path!r}\r\n')
 
-    def __build_aerial__measures(self, path_list: list):
-        self.aerial_measures = dict()
-        for path in path_list:
-            aerial_measure = am.AerialMeasure(path)
-            self.aerial_measures.update({aerial_measure.id: aerial_measure})
+    @staticmethod
+    def __parse_aerial_files(path_list: list, h_fields, workers, executor) -> list:
+        """
+        Parses the aerial files of the simulation, concurrently if several workers are specified.
+
+        :return: list with the parsed data of every file, following path_list order
+        """
+        parse = partial(fm._parse_file_aerial_measure, h_fields=h_fields)
+        if workers is None or workers <= 1 or len(path_list) <= 1:
+            return [parse(path) for path in path_list]
+        pool_class = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+        with pool_class(max_workers=min(workers, len(path_list))) as pool:
+            return list(pool.map(parse, path_list))
+
+    def __build_aerial__measures(self, path_list: list, data_list: list, field_dtype, h_fields, lazy):
+        loaders = dict()
+        for path, data in zip(path_list, data_list):
+            loaders.update({am.get_aerial_id(path): partial(am.AerialMeasure, path, dtype=field_dtype,
+                                                            h_fields=h_fields, data=data)})
+        if lazy:
+            self.aerial_measures = am.AerialMeasureMap(loaders)
+        else:
+            self.aerial_measures = {aerial: loader() for aerial, loader in loaders.items()}
 
     def get_field_value(self, aerial: str, id=None, point_coord=None):
         """
@@ -46,7 +120,222 @@ class Simulation(object):
         :return: FieldValue object matching the given point, None if no value was found. Returns a list of field values
                 for the given aerial if id and point_coord are None.
         """
+        return self.__active.get_field_value(aerial, id=id, point_coord=point_coord)
+
+    def get_point(self, id: int):
+        """
+        Function to get a specific point based on id
+
+        :param id: point targeted id
+        :return: Point object matching the parameters provided, None otherwise
+        """
+        return self.__active.get_point(id)
+
+    def get_point_index(self):
+        """
+        Gets the spatial index over the coordinates of the points used in the simulation, to find the points within
+        a radius of a given one (see fprint_index.PointIndex.query_radius)
+
+        :return: PointIndex object, positions returned by its queries follow points order
+        """
+        return self.__active.get_point_index()
+
+    def cohort(self, selected_points, name=None):
+        """
+        Creates a subgroup of points from a given list of ids, without modifying the simulation.
+        The cohort shares the points, field values and powers of the simulation and can be used in its place
+        (for example, as input of an estimation), so several cohorts of the same simulation can be used at once.
+
+        :param selected_points: list of int with desired point ids.
+        :param name: [optional] string, if given the cohort is also kept within the cohorts dict of the simulation
+        :return: SimulationCohort object
+        """
+        id_index = self.__all_points.get_id_index()
+        rows = np.unique(np.fromiter((id_index[pid] for pid in set(selected_points) if pid in id_index),
+                                     dtype=np.intp))
+        cohort = SimulationCohort(self, rows, name=name)
+        if name is not None:
+            self.cohorts[name] = cohort
+        return cohort
+
+    def cohort_points(self, selected_points=None, restore=False):
+        """
+        Creates a subgroup of points from a given list of ids. If restore is specified,
+        point list will be restored to original.
+
+        :param selected_points: list of int with desired point ids.
+        :param restore: bool value to restore point list to its original.
+        :return:
+        """
+        if restore:
+            self.__active = self.__all_points
+        elif selected_points is not None:
+            self.__active = self.cohort(selected_points)
+        else:
+            warnings.warn("Cohort point ids not specified, subgroup not created".format(self.name))
+
+    def get_powers(self, aerial: str, dbm=True) -> np.ndarray:
+        """
+        Get the power (see FieldValue.power) of every point of the simulation due to an aerial.
+        Powers are calculated at once for all the points the first time they are requested and kept until the
+        simulation is reloaded.
+
+        :param aerial: string with the aerial id. Example: "1", "7" or "all"
+        :param dbm: bool specifying power units (True for using dBm)
+        :return: read-only numpy array of floats with the power of every point, following points order
+        """
+        return self.__active.get_powers(aerial, dbm)
+
+    def _get_original_powers(self, aerial: str, dbm=True) -> np.ndarray:
+        """
+        Get the power of every original point (regardless of cohorts) due to an aerial, see get_powers.
+        """
+        key = (aerial, bool(dbm))
+        powers = self.__powers.get(key)
+        if powers is None:
+            measure = self.aerial_measures[aerial]
+            rows = measure.get_rows(self.original_point_array.ids)
+            powers = fv.get_power_array(measure.ex[rows], measure.ey[rows], measure.ez[rows], dbm)
+            powers.flags.writeable = False
+            self.__powers[key] = powers
+        return powers
+
+    def reload(self):
+        """
+        Reloads the simulation from its folder, using the same options it was created with.
+        Cohorts and calculated powers are discarded.
+        """
+        self.__init__(self.simulation_path, **self.__options)
+
+    @property
+    def original_points(self):
+        """
+        List containing all the points of the simulation, regardless of cohorts.
+        Point objects are built from original_point_array the first time the list is requested.
+        """
+        if self.__original_points is None:
+            self.__original_points = list(self.__original_point_array)
+        return self.__original_points
+
+    @property
+    def original_point_array(self):
+        """PointArray object holding all the points of the simulation, regardless of cohorts"""
+        return self.__original_point_array
+
+    @property
+    def points(self):
+        """List containing all the points used in the simulation"""
+        return self.__active.points
+
+    @property
+    def point_array(self):
+        """PointArray object holding all the points used in the simulation (bulk form of points)"""
+        return self.__active.point_array
+
+
+class SimulationCohort(object):
+    """
+    Class representing a subgroup of points of a simulation (see Simulation.cohort). It holds the rows of its points
+    within the simulation points and shares everything else with the simulation, providing the same methods to
+    access points, field values and powers.
+    """
+    def __init__(self, simulation: Simulation, rows=None, name=None):
+        """
+        :param simulation: Simulation object the cohort belongs to
+        :param rows: [optional] numpy array of ints with the rows of the cohort points within the original points of
+                     the simulation. If None, the cohort holds all the points
+        :param name: [optional] string with the name of the cohort
+        """
+        self.simulation = simulation
+        self.rows = rows
+        self.cohort_name = name
+        self.__points = None
+        self.__point_array = None
+        self.__powers = dict()
+        self.__id_index = None
+        self.__coord_index = None
+        self.__point_index = None
+
+    def __repr__(self):
+        return (f'Cohort: {self.cohort_name!r}\r\n'
+                f'------------------------------\r\n'
+                f'\tSimulation: {self.name!r}\r\n'
+                f'\tNum of points: {len(self.points)!r}\r\n')
+
+    def cohort(self, selected_points, name=None):
+        """
+        Creates a subgroup of the points of the cohort from a given list of ids, see Simulation.cohort.
+        Ids of points out of the cohort are ignored.
+
+        :param selected_points: list of int with desired point ids.
+        :param name: [optional] string, if given the cohort is also kept within the cohorts dict of the simulation
+        :return: SimulationCohort object of the same simulation
+        """
+        rows = self.simulation.cohort(selected_points).rows
+        if self.rows is not None:
+            rows = np.intersect1d(rows, self.rows)
+        cohort = SimulationCohort(self.simulation, rows, name=name)
+        if name is not None:
+            self.simulation.cohorts[name] = cohort
+        return cohort
+
+    @property
+    def name(self):
+        """Name of the simulation"""
+        return self.simulation.name
+
+    @property
+    def simulation_path(self):
+        """Path of the simulation"""
+        return self.simulation.simulation_path
+
+    @property
+    def aerial_measures(self):
+        """Aerial measures of the simulation"""
+        return self.simulation.aerial_measures
 
+    @property
+    def points(self):
+        """List containing the points of the cohort"""
+        if self.__points is None:
+            if self.rows is None:
+                self.__points = self.simulation.original_points
+            else:
+                # Only the points of the cohort are built
+                self.__points = list(self.point_array)
+        if len(self.__points) < 1:
+            warnings.warn("Point list for simulation {} is empty".format(self.name))
+        return self.__points
+
+    @property
+    def point_array(self):
+        """PointArray object holding the points of the cohort (bulk form of points)"""
+        if self.__point_array is None:
+            original_point_array = self.simulation.original_point_array
+            if self.rows is None:
+                self.__point_array = original_point_array
+            else:
+                self.__point_array = original_point_array.take(self.rows)
+        return self.__point_array
+
+    def get_powers(self, aerial: str, dbm=True) -> np.ndarray:
+        """
+        Get the power of every point of the cohort due to an aerial, see Simulation.get_powers
+        """
+        powers = self.simulation._get_original_powers(aerial, dbm)
+        if self.rows is None:
+            return powers
+        key = (aerial, bool(dbm))
+        if key not in self.__powers:
+            cohort_powers = powers[self.rows]
+            cohort_powers.flags.writeable = False
+            self.__powers[key] = cohort_powers
+        return self.__powers[key]
+
+    def get_field_value(self, aerial: str, id=None, point_coord=None):
+        """
+        Get the specific field value of an aerial in a determined point of the cohort, see Simulation.get_field_value
+        """
         if id is None and point_coord is None:
             return [fv for fv in self.aerial_measures[aerial].entries.values()]
 
@@ -57,19 +346,15 @@ class Simulation(object):
                 res = list()
                 for pid in id:
                     res.append(self.aerial_measures[aerial].entries[pid])
-            elif id in self.aerial_measures[aerial].entries:
-                res = self.aerial_measures[aerial].entries[id]
+            else:
+                res = self.aerial_measures[aerial].entries.get(id)
         elif point_coord is not None:
-            if len(self.__points) > 0:
-                point_id = None
-                for pt in self.points:
-                    if pt.x == point_coord[0] and pt.y == point_coord[1] and pt.z == point_coord[2]:
-                        point_id = pt.id
-                        break
-                if point_id is None:
+            if len(self.points) > 0:
+                row = self.get_coord_index().get(tuple(point_coord[:3]))
+                if row is None:
                     res = None
                 else:
-                    res = self.aerial_measures[aerial].entries[point_id]
+                    res = self.aerial_measures[aerial].entries[self.points[row].id]
             else:
                 raise ValueError("List of points for simulation {} is empty".format(self.name))
 
@@ -77,41 +362,41 @@ class Simulation(object):
 
     def get_point(self, id: int):
         """
-        Function to get a specific point based on id
-
-        :param id: point targeted id
-        :return: Point object matching the parameters provided, None otherwise
+        Function to get a specific point of the cohort based on id, see Simulation.get_point
         """
         res = None
-        if len(self.__points) > 0:
-            for pt in self.points:
-                if pt.id == id:
-                    res = pt
-                    break
+        if len(self.points) > 0:
+            row = self.get_id_index().get(id)
+            if row is not None:
+                res = self.points[row]
         else:
             raise ValueError("List of points for simulation {} is empty".format(self.name))
 
         return res
 
-    def cohort_points(self, selected_points=None, restore=False):
-        """
-        Creates a subgroup of points from a given list of ids. If restore is specified,
-        point list will be restored to original.
+    def get_id_index(self) -> dict:
+        """Gets the index of point ids to their position within points, building it if needed"""
+        if self.__id_index is None:
+            index = dict()
+            for row, pt in enumerate(self.points):
+                index.setdefault(pt.id, row)
+            self.__id_index = index
+        return self.__id_index
 
-        :param selected_points: list of int with desired point ids.
-        :param restore: bool value to restore point list to its original.
-        :return:
+    def get_point_index(self):
         """
-        if restore:
-            self.__points = self.__original_points.copy()
-        elif selected_points is not None:
-            self.__points = [pt for pt in self.__original_points if pt.id in selected_points]
-        else:
-            warnings.warn("Cohort point ids not specified, subgroup not created".format(self.name))
+        Gets the spatial index over the coordinates of the points (see fprint_index.PointIndex), building it if
+        needed. Positions returned by its queries follow points order.
+        """
+        if self.__point_index is None:
+            self.__point_index = fi.PointIndex(self.point_array)
+        return self.__point_index
 
-    @property
-    def points(self):
-        """List containing all the points used in the simulation"""
-        if len(self.__points) < 1:
-            warnings.warn("Point list for simulation {} is empty".format(self.name))
-        return self.__points
+    def get_coord_index(self) -> dict:
+        """Gets the index of point coordinates (x, y, z) to their position within points, building it if needed"""
+        if self.__coord_index is None:
+            index = dict()
+            for row, pt in enumerate(self.points):
+                index.setdefault((pt.x, pt.y, pt.z), row)
+            self.__coord_index = index
+        return self.__coord_index
@@ -29,12 +29,8 @@ fig.legend(handles=legend_elements, loc="upper left")
 aerials = ['1', '2', '3', '4', '5', '6']
 
 for aerial in aerials:
-    fprints_powers = []
-    for pt in fprints_sim.points:
-        fprints_powers.append(list((pt, fprints_sim.get_field_value(aerial, id=pt.id).power())))
-    mobile_powers = []
-    for pt in mobiles_sim.points:
-        mobile_powers.append(list((pt, mobiles_sim.get_field_value(aerial, id=pt.id).power())))
+    fprints_powers = [list(entry) for entry in zip(fprints_sim.points, fprints_sim.get_powers(aerial).tolist())]
+    mobile_powers = [list(entry) for entry in zip(mobiles_sim.points, mobiles_sim.get_powers(aerial).tolist())]
 
     plotter.plot_aerial_powers('Aerial ' + aerial, fprints_powers, mobile_powers, fig)
 
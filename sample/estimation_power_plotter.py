@@ -38,15 +38,15 @@ fig.legend(handles=legend_elements, loc="upper left")
 
 
 fpowers = list()
-fpowers.append([fv.power for fv in fprints_sim.get_field_value('1')])
-fpowers.append([fv.power for fv in fprints_sim.get_field_value('2')])
-fpowers.append([fv.power for fv in fprints_sim.get_field_value('3')])
-fpowers.append([fv.power for fv in fprints_sim.get_field_value('4')])
+fpowers.append(fprints_sim.get_powers('1').tolist())
+fpowers.append(fprints_sim.get_powers('2').tolist())
+fpowers.append(fprints_sim.get_powers('3').tolist())
+fpowers.append(fprints_sim.get_powers('4').tolist())
 mpowers = list()
-mpowers.append([fv.power for fv in mobiles_sim.get_field_value('1')])
-mpowers.append([fv.power for fv in mobiles_sim.get_field_value('2')])
-mpowers.append([fv.power for fv in mobiles_sim.get_field_value('3')])
-mpowers.append([fv.power for fv in mobiles_sim.get_field_value('4')])
+mpowers.append(mobiles_sim.get_powers('1').tolist())
+mpowers.append(mobiles_sim.get_powers('2').tolist())
+mpowers.append(mobiles_sim.get_powers('3').tolist())
+mpowers.append(mobiles_sim.get_powers('4').tolist())
 
 estimation = met.get_raytracing_estimation(mobiles_sim, fprints_sim, ['1', '2', '3', '4'])
 
@@ -0,0 +1,183 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import localizationpy.engine as eng
+import localizationpy.fprint_index as fi
+import localizationpy.metrics as mt
+import localizationpy.simulation as sm
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'data')
+SIMULATION_1_PATH = os.path.join(DATA_PATH, 'simulation_1')
+SIMULATION_TEST_PATH = os.path.join(DATA_PATH, 'simulation_test')
+
+AERIALS = [['1'], ['1', '2'], ['1', '2', 'all']]
+
+
+@pytest.fixture(scope='module')
+def simulation_1():
+    """Mobiles and fingerprints taken from alternate points of simulation_1, which has mobiles at -200 dBm"""
+    simulation = sm.Simulation(SIMULATION_1_PATH)
+    ids = [pt.id for pt in simulation.points]
+    mobile_sim = simulation.cohort(ids[::3])
+    fprint_sim = simulation.cohort(ids[1::3])
+    assert (mobile_sim.get_powers('1') == eng.INFINITE_POWER).any()
+    return mobile_sim, fprint_sim
+
+
+@pytest.fixture(scope='module')
+def simulation_test():
+    return (sm.Simulation(os.path.join(SIMULATION_TEST_PATH, 'mobile')),
+            sm.Simulation(os.path.join(SIMULATION_TEST_PATH, 'fingerprints')))
+
+
+def _estimation_key(estimation, order=True, inputs=True):
+    fpoints = [pt.id for pt in estimation.fpoints]
+    epoint = None if estimation.epoint is None else (estimation.epoint.x, estimation.epoint.y, estimation.epoint.z)
+    key = [estimation.mpoint.id, fpoints if order else sorted(fpoints), estimation.error, epoint]
+    if inputs:
+        key.append([(einput.fpoint.id, einput.ed, [(pwm.aerial, pwm.mpower, pwm.fpower, pwm.distance, pwm.in_threshold)
+                                                   for pwm in einput.power_measures])
+                    for einput in estimation.inputs])
+    return key
+
+
+def _assert_same_estimations(a, b, **kwargs):
+    assert len(a) == len(b)
+    for est_a, est_b in zip(a, b):
+        assert _estimation_key(est_a, **kwargs) == _estimation_key(est_b, **kwargs)
+
+
+@pytest.mark.parametrize('aerials', AERIALS)
+@pytest.mark.parametrize('dbm', [True, False])
+@pytest.mark.parametrize('fprints_used', [1, 4])
+def test_raytracing_numpy_matches_python(simulation_1, aerials, dbm, fprints_used):
+    mobile_sim, fprint_sim = simulation_1
+    python = mt.get_raytracing_estimation(mobile_sim, fprint_sim, aerials, fprints_used, dbm, engine='python')
+    numpy = mt.get_raytracing_estimation(mobile_sim, fprint_sim, aerials, fprints_used, dbm, engine='numpy')
+    _assert_same_estimations(python, numpy)
+
+
+@pytest.mark.parametrize('aerials', AERIALS)
+@pytest.mark.parametrize('dbm', [True, False])
+@pytest.mark.parametrize('threshold', [0.5, 3])
+def test_fuzzymap_numpy_matches_python(simulation_1, aerials, dbm, threshold):
+    mobile_sim, fprint_sim = simulation_1
+    python = mt.get_fuzzymap_estimation(mobile_sim, fprint_sim, aerials, threshold, dbm, engine='python')
+    numpy = mt.get_fuzzymap_estimation(mobile_sim, fprint_sim, aerials, threshold, dbm, engine='numpy')
+    _assert_same_estimations(python, numpy, order=False)
+
+
+@pytest.mark.parametrize('model, kwargs', [('raytracing', {'fprints_used': 4}), ('fuzzymap', {'threshold': 1})])
+def test_numpy_matches_python_on_test_simulation(simulation_test, model, kwargs):
+    mobile_sim, fprint_sim = simulation_test
+    python = mt.get_estimation(model, mobile_sim, fprint_sim, aerials=[], points=[], dbm=True, engine='python',
+                               **kwargs)
+    numpy = mt.get_estimation(model, mobile_sim, fprint_sim, aerials=[], points=[], dbm=True, **kwargs)
+    _assert_same_estimations(python, numpy, order=model == 'raytracing')
+
+
+@pytest.mark.parametrize('model, kwargs', [('raytracing', {'fprints_used': 4}), ('fuzzymap', {'threshold': 1})])
+def test_streaming_and_session_match_estimation(simulation_1, model, kwargs):
+    mobile_sim, fprint_sim = simulation_1
+    points = [pt.id for pt in mobile_sim.points[::2]]
+    expected = mt.get_estimation(model, mobile_sim, fprint_sim, aerials=['1', '2'], points=points, dbm=True, **kwargs)
+    streamed = list(mt.iter_estimation(model, mobile_sim, fprint_sim, chunk_size=7, aerials=['1', '2'],
+                                       points=points, dbm=True, **kwargs))
+    session = mt.EstimationSession(mobile_sim, fprint_sim)
+    _assert_same_estimations(expected, streamed)
+    _assert_same_estimations(expected, session.get_estimation(model, aerials=['1', '2'], points=points, dbm=True,
+                                                              **kwargs))
+
+
+@pytest.mark.parametrize('aerials', AERIALS)
+def test_raytracing_k_sweep_matches_estimations(simulation_1, aerials):
+    mobile_sim, fprint_sim = simulation_1
+    results = mt.get_raytracing_k_sweep(mobile_sim, fprint_sim, aerials, 6, chunk_size=50)
+    for k, result in results.items():
+        estimations = mt.get_raytracing_estimation(mobile_sim, fprint_sim, aerials, k)
+        assert result['errors'] == [est.error for est in estimations]
+        assert result['mae'] == mt.get_mae(estimations)
+        assert result['stdev'] == mt.get_stdev(estimations)
+
+
+@pytest.mark.parametrize('aerials', AERIALS)
+def test_fuzzymap_threshold_sweep_matches_estimations(simulation_1, aerials):
+    mobile_sim, fprint_sim = simulation_1
+    thresholds = [0.5, 0, 0.1, 1, 3, 0.5]
+    results = mt.get_fuzzymap_threshold_sweep(mobile_sim, fprint_sim, thresholds, aerials, chunk_size=50)
+    assert sorted(results) == sorted(set(thresholds))
+    for threshold, result in results.items():
+        estimations = mt.get_fuzzymap_estimation(mobile_sim, fprint_sim, aerials, threshold)
+        _assert_same_estimations(estimations, result['estimations'], inputs=False)
+        assert result['mae'] == mt.get_mae(estimations)
+
+
+@pytest.mark.parametrize('aerials', AERIALS)
+@pytest.mark.parametrize('n', [1, 4, 9])
+def test_fingerprint_index_matches_brute_force(simulation_1, aerials, n):
+    mobile_sim, fprint_sim = simulation_1
+    index = fi.FingerprintIndex(fprint_sim, aerials, dbm=True, leaf_size=8)
+    mpowers = eng.get_power_matrix(mobile_sim, aerials, True)
+    expected = eng.get_nearest_indexes(eng.get_power_distances(mpowers, index.fpowers), n)
+    np.testing.assert_array_equal(index.query(mpowers, n), expected)
+
+    estimations = mt.get_raytracing_estimation(mobile_sim, fprint_sim, aerials, n, index=index)
+    _assert_same_estimations(mt.get_raytracing_estimation(mobile_sim, fprint_sim, aerials, n), estimations)
+
+
+def _assert_same_simulations(a, b):
+    assert [(pt.id, pt.x, pt.y, pt.z) for pt in a.points] == [(pt.id, pt.x, pt.y, pt.z) for pt in b.points]
+    assert sorted(a.aerial_measures) == sorted(b.aerial_measures)
+    for aerial in a.aerial_measures:
+        for dbm in (True, False):
+            np.testing.assert_array_equal(a.get_powers(aerial, dbm), b.get_powers(aerial, dbm))
+        measure_a, measure_b = a.aerial_measures[aerial], b.aerial_measures[aerial]
+        assert measure_a.freq == measure_b.freq
+        np.testing.assert_array_equal(measure_a.ids, measure_b.ids)
+        np.testing.assert_array_equal(measure_a.ex, measure_b.ex)
+        np.testing.assert_array_equal(measure_a.ez, measure_b.ez)
+
+
+def test_cache_round_trip(tmp_path, monkeypatch):
+    simulation_path = str(tmp_path / 'simulation_1')
+    shutil.copytree(SIMULATION_1_PATH, simulation_path)
+    parsed = sm.Simulation(simulation_path)
+    built = sm.Simulation(simulation_path, use_cache=True)
+    assert os.path.exists(os.path.join(simulation_path, sm.fm.SIMULATION_CACHE_FILE))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Simulation files parsed instead of using the cache")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(sm.fm, '_parse_file_puntos', fail)
+        patch.setattr(sm.fm, '_parse_file_aerial_measure', fail)
+        cached = sm.Simulation(simulation_path, use_cache=True)
+    _assert_same_simulations(parsed, built)
+    _assert_same_simulations(parsed, cached)
+
+    # Changed files invalidate the cache
+    points_path = os.path.join(simulation_path, 'puntos.dat')
+    with open(points_path) as file:
+        lines = file.readlines()
+    lines[1] = '9.5 9.5 1.5\n'
+    with open(points_path, 'w') as file:
+        file.writelines(lines)
+    changed = sm.Simulation(simulation_path, use_cache=True)
+    assert (changed.points[0].x, changed.points[0].y) == (9.5, 9.5)
+
+
+def test_lazy_loading_round_trip(tmp_path):
+    parsed = sm.Simulation(SIMULATION_1_PATH)
+    lazy = sm.Simulation(SIMULATION_1_PATH, lazy=True)
+    assert not any(lazy.aerial_measures.is_loaded(aerial) for aerial in lazy.aerial_measures)
+    lazy.get_powers('2')
+    assert lazy.aerial_measures.is_loaded('2') and not lazy.aerial_measures.is_loaded('1')
+    _assert_same_simulations(parsed, lazy)
+
+    simulation_path = str(tmp_path / 'simulation_1')
+    shutil.copytree(SIMULATION_1_PATH, simulation_path)
+    sm.Simulation(simulation_path, use_cache=True, lazy=True)
+    _assert_same_simulations(parsed, sm.Simulation(simulation_path, use_cache=True, lazy=True))